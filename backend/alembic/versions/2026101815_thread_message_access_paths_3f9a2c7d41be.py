@@ -0,0 +1,58 @@
+"""thread and chat message access path indexes
+
+Revision ID: 3f9a2c7d41be
+Revises: aecfc19e1c60
+Create Date: 2026-10-18 07:15:02.418310
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3f9a2c7d41be"
+down_revision: Union[str, None] = "aecfc19e1c60"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction, but keeps both tables writable
+    # while the indexes are built on a live database.
+    # The leading thread_id / user_id columns also serve lookups by thread or user
+    # alone (including ON DELETE CASCADE), so no separate single-column index.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_chat_messages_thread_id_create_time",
+            "chat_messages",
+            ["thread_id", "create_time", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_threads_user_id_create_time",
+            "threads",
+            ["user_id", "create_time", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_threads_user_id_create_time",
+            table_name="threads",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            "ix_chat_messages_thread_id_create_time",
+            table_name="chat_messages",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,44 @@
+"""partial index over untitled threads
+
+Revision ID: 8b1e5d0c7a93
+Revises: 3f9a2c7d41be
+Create Date: 2026-10-18 08:20:41.902114
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8b1e5d0c7a93"
+down_revision: Union[str, None] = "3f9a2c7d41be"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Only threads still waiting for a title are indexed, so the title sweeper's
+    # poll stays cheap no matter how many threads exist.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_threads_untitled_create_time",
+            "threads",
+            ["create_time"],
+            unique=False,
+            postgresql_where=sa.text("title IS NULL"),
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_threads_untitled_create_time",
+            table_name="threads",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
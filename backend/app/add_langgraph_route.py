@@ -8,9 +8,21 @@ from langchain_core.messages import (
     SystemMessage,
     BaseMessage,
 )
-from fastapi import FastAPI
-from pydantic import BaseModel
-from typing import List, Literal, Union, Optional, Any
+from fastapi import Depends, FastAPI
+from app.api.deps import CurrentUser, get_current_user
+from langgraph.types import Command
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.metrics import TurnTimer, current_turn_timer
+from app.core.stream_writer import coalesce_text
+from app.langgraph.checkpointer import get_checkpointer_provider
+from app.langgraph.frontend_tools import unanswered_tool_message
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Literal, Union, Optional, Any
+from functools import lru_cache
+from uuid import uuid4
+import hashlib
+import orjson
 
 
 class LanguageModelTextPart(BaseModel):
@@ -63,16 +75,26 @@ class LanguageModelSystemMessage(BaseModel):
     content: str
 
 
+# Unions are discriminated by their role or type field, so pydantic validates
+# each item against one model instead of trying the members in turn.
+LanguageModelUserPart = Annotated[
+    Union[LanguageModelTextPart, LanguageModelImagePart, LanguageModelFilePart],
+    Field(discriminator="type"),
+]
+LanguageModelAssistantPart = Annotated[
+    Union[LanguageModelTextPart, LanguageModelToolCallPart],
+    Field(discriminator="type"),
+]
+
+
 class LanguageModelUserMessage(BaseModel):
     role: Literal["user"]
-    content: List[
-        Union[LanguageModelTextPart, LanguageModelImagePart, LanguageModelFilePart]
-    ]
+    content: List[LanguageModelUserPart]
 
 
 class LanguageModelAssistantMessage(BaseModel):
     role: Literal["assistant"]
-    content: List[Union[LanguageModelTextPart, LanguageModelToolCallPart]]
+    content: List[LanguageModelAssistantPart]
 
 
 class LanguageModelToolMessage(BaseModel):
@@ -80,61 +102,132 @@ class LanguageModelToolMessage(BaseModel):
     content: List[LanguageModelToolResultPart]
 
 
-LanguageModelV1Message = Union[
-    LanguageModelSystemMessage,
-    LanguageModelUserMessage,
-    LanguageModelAssistantMessage,
-    LanguageModelToolMessage,
+LanguageModelV1Message = Annotated[
+    Union[
+        LanguageModelSystemMessage,
+        LanguageModelUserMessage,
+        LanguageModelAssistantMessage,
+        LanguageModelToolMessage,
+    ],
+    Field(discriminator="role"),
 ]
 
 
+def convert_message(msg: LanguageModelV1Message) -> List[BaseMessage]:
+    # one pass over the parts, dispatching on the discriminator fields
+    if msg.role == "user":
+        content = []
+        for p in msg.content:
+            if p.type == "text":
+                content.append({"type": "text", "text": p.text})
+            elif p.type == "image":
+                content.append({"type": "image_url", "image_url": p.image})
+        return [HumanMessage(content=content)]
+
+    if msg.role == "assistant":
+        # Handle both text and tool calls
+        texts = []
+        tool_calls = []
+        for p in msg.content:
+            if p.type == "text":
+                texts.append(p.text)
+            else:
+                tool_calls.append(
+                    {"id": p.toolCallId, "name": p.toolName, "args": p.args}
+                )
+        return [AIMessage(content=" ".join(texts), tool_calls=tool_calls)]
+
+    if msg.role == "tool":
+        return [
+            ToolMessage(content=str(p.result), tool_call_id=p.toolCallId)
+            for p in msg.content
+        ]
+
+    return [SystemMessage(content=msg.content)]
+
+
 def convert_to_langchain_messages(
     messages: List[LanguageModelV1Message],
 ) -> List[BaseMessage]:
     result = []
-
     for msg in messages:
-        if msg.role == "system":
-            result.append(SystemMessage(content=msg.content))
-
-        elif msg.role == "user":
-            content = []
-            for p in msg.content:
-                if isinstance(p, LanguageModelTextPart):
-                    content.append({"type": "text", "text": p.text})
-                elif isinstance(p, LanguageModelImagePart):
-                    content.append({"type": "image_url", "image_url": p.image})
-            result.append(HumanMessage(content=content))
-
-        elif msg.role == "assistant":
-            # Handle both text and tool calls
-            text_parts = [
-                p for p in msg.content if isinstance(p, LanguageModelTextPart)
-            ]
-            text_content = " ".join(p.text for p in text_parts)
-            tool_calls = [
-                {
-                    "id": p.toolCallId,
-                    "name": p.toolName,
-                    "args": p.args,
-                }
-                for p in msg.content
-                if isinstance(p, LanguageModelToolCallPart)
-            ]
-            result.append(AIMessage(content=text_content, tool_calls=tool_calls))
-
-        elif msg.role == "tool":
-            for tool_result in msg.content:
-                result.append(
-                    ToolMessage(
-                        content=str(tool_result.result),
-                        tool_call_id=tool_result.toolCallId,
-                    )
-                )
-
+        result.extend(convert_message(msg))
     return result
 
 
+def _message_key(msg: LanguageModelV1Message) -> bytes:
+    # everything convert_message reads, as one JSON array
+    if msg.role == "system":
+        return orjson.dumps([msg.role, msg.content], default=str)
+    fields = [msg.role]
+    for p in msg.content:
+        if p.type == "text":
+            fields.extend((p.type, p.text))
+        elif p.type == "image":
+            fields.extend((p.type, p.image))
+        elif p.type == "file":
+            fields.extend((p.type, p.data))
+        elif p.type == "tool-call":
+            fields.extend((p.type, p.toolCallId, p.toolName, p.args))
+        else:
+            fields.extend((p.type, p.toolCallId, p.result))
+    return orjson.dumps(fields, default=str)
+
+
+class MessagePrefixCache:
+    # Stateless clients send the whole conversation on every turn. The converted
+    # messages of each request are kept under a hash chained over the fields of
+    # its messages, so when the conversation comes back grown by a few messages,
+    # the longest known prefix is reused and only the new messages are converted.
+    #
+    # Cached messages are shared between requests; they get their id here so
+    # add_messages never has to set one on them.
+    #
+    # Conversations larger than max_bytes (mostly inline images and files) are
+    # converted without the cache, so it holds at most about max_size * max_bytes.
+    def __init__(self, max_size: int, ttl: float, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+
+    def convert(self, messages: List[LanguageModelV1Message]) -> List[BaseMessage]:
+        digests = []
+        size = 0
+        hasher = hashlib.sha256()
+        for msg in messages:
+            key = _message_key(msg)
+            size += len(key)
+            if size > self.max_bytes:
+                return convert_to_langchain_messages(messages)
+            hasher.update(key)
+            digests.append(hasher.copy().digest())
+
+        result: List[BaseMessage] = []
+        start = 0
+        for i in range(len(digests) - 1, -1, -1):
+            cached = self._cache.get(digests[i])
+            if cached is not None:
+                result.extend(cached)
+                start = i + 1
+                break
+        for msg in messages[start:]:
+            for message in convert_message(msg):
+                message.id = str(uuid4())
+                result.append(message)
+        if digests:
+            self._cache.set(digests[-1], tuple(result))
+        return result
+
+
+@lru_cache(maxsize=1)
+def get_message_prefix_cache() -> MessagePrefixCache:
+    config = get_settings().langgraph
+    return MessagePrefixCache(
+        max_size=config.message_cache_size,
+        ttl=config.message_cache_ttl_secs,
+        max_bytes=config.message_cache_max_bytes,
+    )
+
+
 class FrontendToolCall(BaseModel):
     name: str
     description: Optional[str] = None
@@ -145,35 +238,123 @@ class ChatRequest(BaseModel):
     system: Optional[str] = ""
     tools: Optional[List[FrontendToolCall]] = []
     messages: List[LanguageModelV1Message]
+    # With a thread_id the conversation is kept in the checkpointer and messages
+    # holds only the new ones, without it the whole history is sent every time.
+    thread_id: Optional[str] = Field(default=None, max_length=128)
 
 
 def add_langgraph_route(app: FastAPI, graph, path: str):
-    async def chat_completions(request: ChatRequest):
-        inputs = convert_to_langchain_messages(request.messages)
-
-        async def run(controller: RunController):
-            tool_calls = {}
-            tool_calls_by_idx = {}
-
-            async for msg, metadata in graph.astream(
-                {"messages": inputs},
-                {
-                    "configurable": {
-                        "system": request.system,
-                        "frontend_tools": request.tools,
-                    }
-                },
-                stream_mode="messages",
+    checkpointed_graph = None
+
+    async def get_checkpointed_graph():
+        nonlocal checkpointed_graph
+        if checkpointed_graph is None:
+            checkpointer = await get_checkpointer_provider().get()
+            checkpointed_graph = graph.copy(update={"checkpointer": checkpointer})
+        return checkpointed_graph
+
+    async def resume_input(run_graph, configurable: dict, inputs: list[BaseMessage]):
+        # A run interrupted by frontend tool calls (see
+        # app/langgraph/frontend_tools.py) is resumed with the tool results of
+        # the request. Any other input starts a new run on the thread, after the
+        # pending calls are closed with error results: a model message whose
+        # tool calls have no results is rejected by the providers.
+        config = {"configurable": configurable}
+        state = await run_graph.aget_state(config)
+        interrupts = [i for task in state.tasks for i in task.interrupts]
+        if not interrupts:
+            return {"messages": inputs}
+        results = {
+            message.tool_call_id: message.content
+            for message in inputs
+            if isinstance(message, ToolMessage)
+        }
+        if results:
+            return Command(resume=results)
+        calls = [call for i in interrupts for call in i.value["tool_calls"]]
+        await run_graph.aupdate_state(
+            config,
+            {"messages": [unanswered_tool_message(call) for call in calls]},
+            as_node="frontend_tools",
+        )
+        return {"messages": inputs}
+
+    async def chat_completions(
+        request: ChatRequest, user: CurrentUser = Depends(get_current_user)
+    ):
+        # with a thread_id only the new messages are sent, nothing to reuse
+        if request.thread_id or not get_settings().langgraph.message_cache_size:
+            inputs = convert_to_langchain_messages(request.messages)
+        else:
+            inputs = get_message_prefix_cache().convert(request.messages)
+        configurable = {
+            "system": request.system,
+            "frontend_tools": request.tools,
+        }
+        run_graph = graph
+        graph_input = {"messages": inputs}
+        if request.thread_id:
+            # the checkpoints of a thread belong to the user who created it
+            configurable["thread_id"] = f"{user.id}:{request.thread_id}"
+            run_graph = await get_checkpointed_graph()
+            graph_input = await resume_input(run_graph, configurable, inputs)
+
+        async def events():
+            # Tool results come from the "custom" stream as soon as each tool
+            # finishes (see app/langgraph/tool_node.py), and again in "messages"
+            # once the whole tools step is done.
+            results = set()
+            async for mode, chunk in run_graph.astream(
+                graph_input,
+                {"configurable": configurable},
+                stream_mode=["messages", "custom"],
             ):
+                msg = chunk if mode == "custom" else chunk[0]
                 if isinstance(msg, ToolMessage):
-                    tool_controller = tool_calls[msg.tool_call_id]
-                    tool_controller.set_result(msg.content)
+                    if msg.tool_call_id not in results:
+                        results.add(msg.tool_call_id)
+                        yield msg
 
                 if isinstance(msg, AIMessageChunk) or isinstance(msg, AIMessage):
                     if msg.content:
-                        controller.append_text(msg.content)
+                        yield msg.content
+                    if isinstance(msg, AIMessageChunk) and msg.tool_call_chunks:
+                        yield msg.tool_call_chunks
 
-                    for chunk in msg.tool_call_chunks:
+        async def run(controller: RunController):
+            tool_calls = {}
+            tool_calls_by_idx = {}
+            timer = TurnTimer("graph")
+            if request.thread_id:
+                timer.fields["thread_id"] = request.thread_id
+            current_turn_timer.set(timer)
+            status = "cancelled"
+            try:
+                await stream_events(controller, tool_calls, tool_calls_by_idx, timer)
+                status = "ok"
+            except Exception:
+                status = "error"
+                raise
+            finally:
+                timer.mark("generation")
+                timer.finish(status)
+
+        async def stream_events(controller, tool_calls, tool_calls_by_idx, timer):
+            # Text is coalesced into fewer appends and flushed before each tool
+            # call chunk or result, see app/core/stream_writer.py
+            async for event in coalesce_text(events()):
+                timer.first_token()
+                if isinstance(event, str):
+                    controller.append_text(event)
+
+                elif isinstance(event, ToolMessage):
+                    # results of frontend tools called in an earlier request
+                    # are already shown by the client
+                    if event.tool_call_id in tool_calls:
+                        tool_calls[event.tool_call_id].set_result(event.content)
+
+                else:
+                    for chunk in event:
                         if not chunk["index"] in tool_calls_by_idx:
                             tool_controller = await controller.add_tool_call(
                                 chunk["name"], chunk["id"]
@@ -1,6 +1,14 @@
 JWT_ERROR_USER_REMOVED = "User removed"
+JWT_ERROR_USER_INACTIVE = "User inactive"
 PASSWORD_INVALID = "Incorrect email or password"
 REFRESH_TOKEN_NOT_FOUND = "Refresh token not found"
 REFRESH_TOKEN_EXPIRED = "Refresh token expired"
 REFRESH_TOKEN_ALREADY_USED = "Refresh token already used"
 EMAIL_ADDRESS_ALREADY_USED = "Cannot use this email address"
+PAGINATION_CURSOR_INVALID = "Invalid pagination cursor"
+CHAT_CURSOR_CONFLICT = "Use either before or after, and only after when streaming"
+PASSWORD_HASHER_BUSY = "Too many sign-in attempts in progress, retry shortly"
+CHAT_TURN_NOT_FOUND = "Chat turn not found or expired, reload the chat history"
+CHAT_TURN_IN_PROGRESS = "An answer is already being generated in this thread"
+CHAT_TURN_FAILED = "The message could not be processed, retry"
+CHAT_RATE_LIMITED = "Too many chat requests, retry after the given delay"
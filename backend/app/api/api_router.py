@@ -1,8 +1,9 @@
 from fastapi import APIRouter
-from app.api.endpoints import auth, threads, users
+from app.api.endpoints import auth, threads, users, well_known
 
 api_router = APIRouter()
 
 api_router.include_router(auth.router, tags=["auth"], prefix="/auth")
 api_router.include_router(threads.router, tags=["threads"], prefix="/threads")
 api_router.include_router(users.router, tags=["users"], prefix="/users")
+api_router.include_router(well_known.router, tags=["auth"], prefix="/.well-known")
@@ -1,19 +1,54 @@
 from collections.abc import AsyncGenerator
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import Annotated
 
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy import select
+from sqlalchemy import event, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import api_messages
 from app.core import database_session
+from app.core.cache import TTLCache
+from app.core.config import get_settings
 from app.core.security.jwt import verify_jwt_token
 from app.models.user import User
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/access-token")
 
 
+@dataclass(frozen=True, slots=True)
+class CurrentUser:
+    # Slim, cacheable principal of the authenticated user; handlers that need
+    # the ORM object (e.g. its refresh tokens) should load it themselves.
+    id: str
+    display_name: str
+    email: str
+    is_active: bool
+    is_superuser: bool
+
+
+@lru_cache(maxsize=1)
+def get_user_cache() -> TTLCache:
+    security = get_settings().security
+    return TTLCache(
+        max_size=security.user_cache_max_size, ttl=security.user_cache_ttl_secs
+    )
+
+
+def invalidate_cached_user(user_id: str) -> None:
+    get_user_cache().pop(str(user_id))
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_cached_user_on_change(mapper, connection, target: User) -> None:
+    # Covers ORM updates and deletes in this process (e.g. deactivation); other
+    # workers drop the entry when its TTL expires.
+    invalidate_cached_user(target.id)
+
+
 async def get_session() -> AsyncGenerator[AsyncSession]:
     async with database_session.get_async_session() as session:
         yield session
@@ -21,16 +56,37 @@ async def get_session() -> AsyncGenerator[AsyncSession]:
 
 async def get_current_user(
     token: Annotated[str, Depends(oauth2_scheme)],
-    session: AsyncSession = Depends(get_session),
-) -> User:
+) -> CurrentUser:
     token_payload = verify_jwt_token(token)
 
-    user = await session.scalar(select(User).where(User.id == token_payload.sub))
-
+    user_cache = get_user_cache()
+    user = user_cache.get(token_payload.sub)
     if user is None:
+        # Own short session, so a cache hit never checks out a connection.
+        async with database_session.get_async_session() as session:
+            row = (
+                await session.execute(
+                    select(
+                        User.id,
+                        User.display_name,
+                        User.email,
+                        User.is_active,
+                        User.is_superuser,
+                    ).where(User.id == token_payload.sub)
+                )
+            ).first()
+        if row is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail=api_messages.JWT_ERROR_USER_REMOVED,
+            )
+        user = CurrentUser(**row._asdict())
+        user_cache.set(token_payload.sub, user)
+
+    if not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=api_messages.JWT_ERROR_USER_REMOVED,
+            detail=api_messages.JWT_ERROR_USER_INACTIVE,
         )
     return user
 
@@ -13,8 +13,8 @@ from app.core.config import get_settings
 from app.core.security.jwt import create_jwt_token
 from app.core.security.password import (
     DUMMY_PASSWORD,
-    get_password_hash,
-    verify_password,
+    get_password_hash_async,
+    verify_password_async,
 )
 from app.models.user import RefreshToken, User
 from app.schemas.requests import RefreshTokenRequest, UserCreateRequest
@@ -74,14 +74,14 @@ async def login_access_token(
 
     if user is None:
         # this is naive method to not return early
-        verify_password(form_data.password, DUMMY_PASSWORD)
+        await verify_password_async(form_data.password, DUMMY_PASSWORD)
 
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=api_messages.PASSWORD_INVALID,
         )
 
-    if not verify_password(form_data.password, user.hashed_password):
+    if not await verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=api_messages.PASSWORD_INVALID,
@@ -178,7 +178,7 @@ async def register_new_user(
     user = User(
         display_name=new_user.display_name,
         email=new_user.email,
-        hashed_password=get_password_hash(new_user.password),
+        hashed_password=await get_password_hash_async(new_user.password),
     )
     session.add(user)
 
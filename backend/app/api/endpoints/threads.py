@@ -1,8 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+import hashlib
+import uuid
+from collections.abc import AsyncIterator
+from dataclasses import astuple
+from datetime import datetime, timezone
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    status,
+)
 from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
 from pydantic_ai import Agent
-from pydantic_ai.usage import UsageLimits
+from pydantic_ai.usage import Usage, UsageLimits
 from pydantic_ai.exceptions import UnexpectedModelBehavior
 from pydantic_ai.messages import (
     ModelMessage,
@@ -11,22 +25,42 @@ from pydantic_ai.messages import (
     TextPart,
     UserPromptPart,
 )
-from pydantic_ai.models.openai import OpenAIModel
-from pydantic_ai.models.gemini import GeminiModel
-from pydantic_ai.providers.openai import OpenAIProvider
-from pydantic_ai.providers.google_gla import GoogleGLAProvider
-from sqlalchemy import select
+from sqlalchemy import delete, select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.logger import get_logger
-from app.api.deps import get_session, get_current_user
+from app.api import api_messages
+from app.api.deps import CurrentUser, get_session, get_current_user
+from app.api.pagination import decode_cursor, encode_cursor, set_next_cursor
+from app.chat.context import estimate_tokens, load_context_window
+from app.chat.model_config import (
+    get_context_limits,
+    get_model_backends,
+    get_model_config,
+    resolve_model_config,
+)
+from app.chat.response_cache import CacheLookup, get_response_cache, replay_chunks
+from app.chat.titles import get_title_worker
+from app.chat.turns import (
+    Turn,
+    get_turn_store,
+    parse_last_event_id,
+    start_turn,
+    stream_turn_events,
+)
 from app.core.config import get_settings
+from app.core.llm import UnsupportedProviderError, get_model_registry
+from app.core.llm_router import ModelBackend, routed_run_stream
+from app.core.metrics import TurnTimer, current_turn_timer, start_turn_timer
+from app.core.rate_limit import get_rate_limiter
+from app.core.stream_writer import coalesce_text
 from app.core.database_session import get_async_session
 from app.models.chat_message import ChatMessage
-from app.models.user import User
 from app.models.thread import Thread
 from app.schemas.requests import ThreadChatMessageRequest
 from app.schemas.responses import (
     ChatMessageResponse,
+    ChatStreamDoneResponse,
+    ChatStreamErrorResponse,
     CreateThreadResponse,
     ThreadDetailResponse,
     ThreadListResponse,
@@ -36,22 +70,50 @@ router = APIRouter()
 _logger = get_logger(__name__)
 
 
+THREADS_PAGE_DEFAULT_LIMIT = 50
+THREADS_PAGE_MAX_LIMIT = 200
+
+
+def parse_thread_id(id: str) -> str:
+    # Thread.id binds as a string; ValueError for anything but a UUID
+    return str(uuid.UUID(id))
+
+
 @router.get("", response_model=list[ThreadListResponse])
 async def get_threads(
+    response: Response,
+    cursor: str | None = None,
+    limit: int = Query(
+        default=THREADS_PAGE_DEFAULT_LIMIT, ge=1, le=THREADS_PAGE_MAX_LIMIT
+    ),
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_current_user),
+    user: CurrentUser = Depends(get_current_user),
 ):
-    threads = await session.execute(
-        select(Thread)
+    # Keyset pagination over (create_time, id), newest first. Only the columns of
+    # ThreadListResponse are selected so the thread relationships are never loaded.
+    query = (
+        select(Thread.id, Thread.title, Thread.create_time, Thread.update_time)
         .where(Thread.user_id == user.id)
-        .order_by(Thread.create_time.desc())
+        .order_by(Thread.create_time.desc(), Thread.id.desc())
+        .limit(limit + 1)
     )
-    threads = threads.scalars().all()
-    if not threads or len(threads) == 0:
+    if cursor is not None:
+        cursor_create_time, cursor_id = decode_cursor(cursor, parse_thread_id)
+        query = query.where(
+            tuple_(Thread.create_time, Thread.id)
+            < tuple_(cursor_create_time, cursor_id)
+        )
+    threads = (await session.execute(query)).all()
+    if cursor is None and len(threads) == 0:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User has no threads",
         )
+    if len(threads) > limit:
+        threads = threads[:limit]
+        set_next_cursor(
+            response, encode_cursor(threads[-1].create_time, threads[-1].id)
+        )
     return threads
 
 
@@ -95,7 +157,7 @@ def to_model_chat_message(message: ChatMessage) -> ModelMessage:
 async def get_thead_details(
     thread_id: str,
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_current_user),
+    user: CurrentUser = Depends(get_current_user),
 ):
     result_thread = await session.scalar(
         select(Thread).where(Thread.user_id == user.id).where(Thread.id == thread_id)
@@ -114,68 +176,247 @@ async def get_thead_details(
     }
 
 
+CHAT_PAGE_DEFAULT_LIMIT = 100
+CHAT_PAGE_MAX_LIMIT = 500
+CHAT_STREAM_BATCH_SIZE = 500
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+def chat_history_query(
+    thread_id: str,
+    before: int | None = None,
+    after: int | None = None,
+    newest_first: bool = False,
+):
+    # Messages are ordered by (create_time, id); a message-id cursor is resolved to
+    # its sort key with a scalar subquery so the seek stays on the thread index.
+    query = select(ChatMessage).where(ChatMessage.thread_id == thread_id)
+    for cursor_id, is_before in ((before, True), (after, False)):
+        if cursor_id is None:
+            continue
+        cursor_create_time = (
+            select(ChatMessage.create_time)
+            .where(ChatMessage.thread_id == thread_id)
+            .where(ChatMessage.id == cursor_id)
+            .scalar_subquery()
+        )
+        sort_key = tuple_(ChatMessage.create_time, ChatMessage.id)
+        cursor_key = tuple_(cursor_create_time, cursor_id)
+        query = query.where(
+            sort_key < cursor_key if is_before else sort_key > cursor_key
+        )
+    if newest_first:
+        return query.order_by(ChatMessage.create_time.desc(), ChatMessage.id.desc())
+    return query.order_by(ChatMessage.create_time.asc(), ChatMessage.id.asc())
+
+
+async def stream_chat_history(thread_id: str, after: int | None, limit: int | None):
+    # Uses its own session: the request session is released before the response
+    # body is sent, and rows are pulled from a server-side cursor in batches.
+    query = chat_history_query(thread_id, after=after).execution_options(
+        yield_per=CHAT_STREAM_BATCH_SIZE
+    )
+    if limit is not None:
+        query = query.limit(limit)
+    async with get_async_session() as session:
+        messages = await session.stream_scalars(query)
+        async for message in messages:
+            chat_message = ChatMessageResponse.model_validate(message)
+            yield chat_message.model_dump_json().encode("utf-8") + b"\n"
+
+
 @router.get("/{thread_id}/chat", response_model=list[ChatMessageResponse])
 async def get_chat(
     thread_id: str,
+    response: Response,
+    before: int | None = None,
+    after: int | None = None,
+    limit: int | None = Query(default=None, ge=1, le=CHAT_PAGE_MAX_LIMIT),
+    stream: bool = False,
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_current_user),
+    user: CurrentUser = Depends(get_current_user),
 ):
-    result_thread = await session.scalar(
-        select(Thread).where(Thread.user_id == user.id).where(Thread.id == thread_id)
+    result_thread_id = await session.scalar(
+        select(Thread.id).where(Thread.user_id == user.id).where(Thread.id == thread_id)
     )
-    if not result_thread:
+    if not result_thread_id:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Thread {thread_id} not found.",
         )
+    if before is not None and (after is not None or stream):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=api_messages.CHAT_CURSOR_CONFLICT,
+        )
+    if stream:
+        await session.close()
+        return StreamingResponse(
+            stream_chat_history(thread_id, after, limit),
+            media_type="application/x-ndjson",
+        )
+    if limit is None and before is None and after is None:
+        results = await session.execute(chat_history_query(thread_id))
+        return results.scalars().all()
+
+    # The newest page and "before" pages are read newest first and reversed.
+    newest_first = after is None
+    limit = limit or CHAT_PAGE_DEFAULT_LIMIT
     results = await session.execute(
-        select(ChatMessage)
-        .where(ChatMessage.thread_id == thread_id)
-        .order_by(ChatMessage.create_time.asc())
+        chat_history_query(thread_id, before, after, newest_first).limit(limit + 1)
+    )
+    messages = list(results.scalars().all())
+    if len(messages) > limit:
+        messages = messages[:limit]
+        set_next_cursor(response, str(messages[-1].id))
+    if newest_first:
+        messages.reverse()
+    return messages
+
+
+async def save_assistant_message(
+    thread_id: str, content: str, usage: dict | None
+) -> ChatMessage:
+    async with get_async_session() as session:
+        new_chat_message = ChatMessage(
+            role="assistant",
+            content=content,
+            content_type="text",
+            thread_id=thread_id,
+            usage=usage,
+        )
+        session.add(new_chat_message)
+        await session.commit()
+        await session.refresh(new_chat_message)
+    return new_chat_message
+
+
+async def delete_chat_message(message_id: int) -> bool:
+    # best effort, the database may be what failed
+    try:
+        async with get_async_session() as session:
+            await session.execute(
+                delete(ChatMessage).where(ChatMessage.id == message_id)
+            )
+            await session.commit()
+        return True
+    except Exception:
+        _logger.exception(f"Could not delete chat message {message_id}")
+        return False
+
+
+async def generate_answer(
+    candidates: list[tuple[ModelBackend, Agent]],
+    prompt: str,
+    message_history: list[ModelMessage],
+    thread_id: str,
+    user_id: str,
+    model_code: str | None,
+    cache_lookup: CacheLookup | None = None,
+) -> AsyncIterator[str | ChatStreamDoneResponse]:
+    # Phase 2, no connection checked out: stream from the model. Token chunks are
+    # merged into frames by the flush policy.
+    timer = current_turn_timer.get() or TurnTimer()
+    response_cache = get_response_cache()
+    cached_answer = None
+    if response_cache is not None and cache_lookup is not None:
+        cached_answer = response_cache.get(cache_lookup)
+
+    if cached_answer is not None:
+        # A hit takes the same path as model output, only without a model call.
+        timer.fields["cache"] = "hit"
+        timer.first_token()
+        async for text in coalesce_text(replay_chunks(cached_answer)):
+            yield text
+        content, usage = cached_answer, Usage()
+    else:
+        usage_limits = UsageLimits(
+            request_limit=5,
+        )
+        async with routed_run_stream(
+            candidates,
+            prompt,
+            message_history=message_history,
+            usage_limits=usage_limits,
+        ) as result:
+            # entered once the first token arrived
+            timer.first_token()
+            timer.fields["backend"] = f"{result.backend.provider}:{result.backend.name}"
+            async for text in coalesce_text(result.stream_text()):
+                yield text
+            usage = result.usage()
+            content = result.content
+        if response_cache is not None and cache_lookup is not None:
+            response_cache.set(cache_lookup, content)
+    timer.mark("generation")
+    timer.response_tokens = usage.response_tokens
+
+    # Phase 3, in a fresh short session: persist the answer.
+    saved_message = await save_assistant_message(thread_id, content, usage.__dict__)
+    await get_rate_limiter().record_usage(
+        user_id, model_code, (saved_message.usage or {}).get("total_tokens")
+    )
+    timer.mark("persist")
+    yield ChatStreamDoneResponse(
+        message=ChatMessageResponse.model_validate(saved_message),
+        usage=saved_message.usage,
+    )
+
+
+def sse_response(turn: Turn, after_seq: int = 0) -> StreamingResponse:
+    return StreamingResponse(
+        stream_turn_events(turn, after_seq),
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class ChatTurnFailedError(Exception):
+    pass
+
+
+async def stream_turn_ndjson(turn: Turn, stream_mode: str):
+    # Delta events are already serialized frames and are forwarded as they are:
+    # O(N) bytes for an N token answer, where snapshots resend the answer so far.
+    text_so_far = ""
+    timestamp = datetime.now(timezone.utc)
+    async for turn_event in turn.subscribe():
+        if stream_mode == "delta":
+            yield turn_event.data.encode("utf-8") + b"\n"
+            continue
+        if turn_event.event == "snapshot":
+            text_so_far = turn_event.text
+        elif turn_event.event == "delta":
+            text_so_far += turn_event.text
+        elif turn_event.event == "error":
+            # Snapshot lines have no error frame: abort the response so clients
+            # tell a failed answer from a complete one, as before turns existed.
+            raise ChatTurnFailedError(f"Chat turn {turn.turn_id} failed")
+        else:
+            continue
+        m = ModelResponse(parts=[TextPart(text_so_far)], timestamp=timestamp)
+        chat_message = to_chat_message_response(m)
+        yield (chat_message.model_dump_json()).encode("utf-8") + b"\n"
+
+
+def turn_response(turn: Turn, request: Request, stream_mode: str) -> StreamingResponse:
+    if SSE_MEDIA_TYPE in request.headers.get("accept", ""):
+        return sse_response(turn)
+    return StreamingResponse(
+        stream_turn_ndjson(turn, stream_mode), media_type="application/x-ndjson"
     )
-    all_messages = results.scalars().all()
-    return all_messages
-
-
-def get_model_config(model_name: str) -> dict | None:
-    model_code_config = {
-        "GPT_4O": {
-            "provider": "openai",
-            "name": "gpt-4o",
-        },
-        "GPT_4O_MINI": {
-            "provider": "openai",
-            "name": "gpt-4o-mini",
-        },
-        "O3_MINI": {
-            "provider": "openai",
-            "name": "o3-mini",
-        },
-        "GROQ_LLAMA_3_3_70B": {
-            "provider": "groq",
-            "name": "llama-3.3-70b-versatile",
-            "base_url": "https://api.groq.com/openai/v1",
-        },
-        "GROQ_DEEPSEEK_R1_DISTILL_LLAMA_3.3_70B": {
-            "provider": "groq",
-            "name": "deepseek-r1-distill-llama-70b",
-            "base_url": "https://api.groq.com/openai/v1",
-        },
-        "GEMINI_2.0_FLASH": {"provder": "google", "name": "gemini-2.0-flash"},
-        "GEMINI_2.0_FLASH_LITE": {"provder": "google", "name": "gemini-2.0-flash-lite"},
-    }
-    if model_name in model_code_config:
-        return model_code_config.get(model_name)
-    return None
 
 
 @router.post("/{thread_id}/chat")
 async def post_chat_message(
     thread_id: str,
     body: ThreadChatMessageRequest,
+    request: Request,
+    timer: TurnTimer = Depends(start_turn_timer),
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_current_user),
+    user: CurrentUser = Depends(get_current_user),
 ) -> StreamingResponse:
+    timer.mark("auth")
     thread = await session.scalar(
         select(Thread).where(Thread.user_id == user.id).where(Thread.id == thread_id)
     )
@@ -183,12 +424,46 @@ async def post_chat_message(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Thread not found"
         )
+    model_config = resolve_model_config(thread.config)
+    registry = get_model_registry()
+    try:
+        candidates = [
+            (backend, registry.get_agent(*astuple(backend)))
+            for backend in get_model_backends(
+                model_config, thread.config.get("model_code")
+            )
+        ]
+    except UnsupportedProviderError:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, "Unsupported LLM provider")
 
-    async def stream_response():
-        relevant_messages = await session.execute(
-            select(ChatMessage).where(ChatMessage.thread_id == thread_id).limit(10)
+    # Single flight per thread: a double submit or a client retry must not start
+    # a second generation. A request repeating the idempotency key of the current
+    # turn, or without a key the prompt of the running turn, attaches to its
+    # stream; any other request waits for the turn to end.
+    turn_store = get_turn_store()
+    model_code = thread.config.get("model_code")
+    prompt_digest = hashlib.sha256(body.prompt.encode("utf-8")).hexdigest()
+    turn, created = await turn_store.claim(
+        thread_id, body.idempotency_key, prompt_digest
+    )
+    if turn is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=api_messages.CHAT_TURN_IN_PROGRESS,
         )
-        message_history: list[ModelMessage] = []
+    timer.model_code = model_code
+    timer.fields.update(thread_id=thread_id, turn_id=turn.turn_id)
+    if not created:
+        return turn_response(turn, request, body.stream_mode)
+
+    stored_prompt_id = None
+    try:
+        # only requests that start a model call are counted
+        await get_rate_limiter().admit(
+            user.id, model_code, estimate_tokens(body.prompt)
+        )
+
+        # Phase 1, on the request session: store the prompt and load the context.
         if not body.is_new_chat:
             new_user_message = ChatMessage(
                 thread_id=thread_id,
@@ -198,76 +473,122 @@ async def post_chat_message(
                 content_type=body.content_type or "text",
             )
             session.add(new_user_message)
+            await session.flush()
+            stored_prompt_id = new_user_message.id
             await session.commit()
 
-        for message in relevant_messages.scalars().all():
-            message_history.append(to_model_chat_message(message))
-        app_config = get_settings().appconfig
-        provider_name = thread.config.get("provider", "openai")
-        model_name = thread.config.get("name", "gpt-4o-mini")
-        if provider_name == "google":
-            api_key = app_config.gemini_api_key.get_secret_value()
-            provider = GoogleGLAProvider(api_key)
-            model = GeminiModel(model_name=model_name, provider=provider)
-        elif provider_name in ["openai", "groq"]:
-            api_key = (
-                app_config.groq_api_key
-                if provider_name == "groq"
-                else app_config.openai_api_key
-            ).get_secret_value()
-            base_url = thread.config.get("base_url")
-            provider = OpenAIProvider(api_key=api_key, base_url=base_url)
-            model = OpenAIModel(
-                model_name=model_name,
-                provider=provider,
+        # The prompt is the newest message of the window: for a new chat it was
+        # stored by create_thread, otherwise it was just committed above.
+        max_messages, max_tokens = get_context_limits(model_code)
+        window = await load_context_window(session, thread_id, max_messages, max_tokens)
+        prompt = body.prompt
+        if window and window[-1].role == "user":
+            prompt = window.pop().content
+        message_history: list[ModelMessage] = [
+            to_model_chat_message(message) for message in window
+        ]
+        cache_lookup = None
+        response_cache = get_response_cache()
+        if (
+            response_cache is not None
+            and thread.config.get("response_cache", True)
+            and len(window) < get_settings().response_cache.max_history_messages
+        ):
+            cache_lookup = response_cache.lookup_for(
+                (
+                    model_config.get("provider", "openai"),
+                    model_config.get("name", "gpt-4o-mini"),
+                    model_config.get("base_url"),
+                ),
+                "",
+                [(message.role, message.content) for message in window]
+                + [("user", prompt)],
             )
-        else:
-            raise HTTPException(status.HTTP_400_BAD_REQUEST, "Unsupported LLM provider")
-        agent = Agent(model=model, instrument=True)
-        usage_limits = UsageLimits(
-            request_limit=5,
-        )
-        async with agent.run_stream(
-            message_history[0].parts[0].content if body.is_new_chat else body.prompt,
-            message_history=[] if body.is_new_chat else message_history,
-            usage_limits=usage_limits,
-        ) as result:
-            async for text in result.stream():
-                m = ModelResponse(parts=[TextPart(text)], timestamp=result.timestamp())
-                chat_message = to_chat_message_response(m)
-                yield (chat_message.model_dump_json()).encode("utf-8") + b"\n"
-            # add response
-            usage = result.usage()
+        # Give the connection back to the pool before generation starts, a stream
+        # can run for a minute and must not hold one of the pool's connections.
+        await session.close()
+        timer.mark("history")
+    except BaseException:
+        # Fail the turn for anyone attached to it. The retry of this request stores
+        # the prompt again, so the stored one is removed, then the thread and the
+        # idempotency key are released for the retry to start a new turn. If the
+        # prompt cannot be removed, the key stays on the failed turn instead.
+        error = ChatStreamErrorResponse(detail=api_messages.CHAT_TURN_FAILED)
+        await turn.publish(error.type, error.model_dump_json())
+        await turn.finish()
+        if stored_prompt_id is None or await delete_chat_message(stored_prompt_id):
+            await turn_store.discard(turn)
+        raise
 
-            msg = result.new_messages()[-1]
-            new_chat_message = ChatMessage(
-                role="assistant",
-                content=msg.parts[0].content,
-                content_type="text",
-                thread_id=thread_id,
-                usage=usage.__dict__,
-            )
-            session.add(new_chat_message)
-        await session.commit()
+    # Generation is detached from this connection, see app/chat/turns.py
+    start_turn(
+        turn,
+        generate_answer(
+            candidates,
+            prompt,
+            message_history,
+            thread_id,
+            user.id,
+            model_code,
+            cache_lookup,
+        ),
+    )
+    return turn_response(turn, request, body.stream_mode)
+
+
+@router.get("/{thread_id}/chat/stream")
+async def resume_chat_stream(
+    thread_id: str,
+    last_event_id: str | None = Header(default=None),
+    session: AsyncSession = Depends(get_session),
+    user: CurrentUser = Depends(get_current_user),
+) -> StreamingResponse:
+    # Reconnect to a turn started with "Accept: text/event-stream": replays the
+    # events after Last-Event-ID, then follows the live tail. Without the header
+    # the latest turn of the thread is streamed from its start.
+    result_thread_id = await session.scalar(
+        select(Thread.id).where(Thread.user_id == user.id).where(Thread.id == thread_id)
+    )
+    if not result_thread_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Thread {thread_id} not found.",
+        )
+    await session.close()
 
-    return StreamingResponse(stream_response(), media_type="application/x-ndjson")
+    turn_store = get_turn_store()
+    after_seq = 0
+    if last_event_id:
+        parsed = parse_last_event_id(last_event_id)
+        turn = await turn_store.get(parsed[0]) if parsed else None
+        after_seq = parsed[1] if parsed else 0
+    else:
+        turn = await turn_store.get_active(thread_id)
+    if turn is None or turn.thread_id != thread_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=api_messages.CHAT_TURN_NOT_FOUND,
+        )
+    return sse_response(turn, after_seq)
 
 
 @router.post("/new", response_model=CreateThreadResponse)
 async def create_thread(
     body: ThreadChatMessageRequest,
-    background_tasks: BackgroundTasks,
     session: AsyncSession = Depends(get_session),
-    user: User = Depends(get_current_user),
+    user: CurrentUser = Depends(get_current_user),
 ):
     model_config = get_model_config(body.model_code)
     if not model_config:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported model code."
         )
+    thread_config = dict(**model_config, model_code=body.model_code)
+    if body.response_cache is False:
+        thread_config["response_cache"] = False
     new_thread = Thread(
         user_id=user.id,
-        config=dict(**model_config, model_code=body.model_code),
+        config=thread_config,
     )
     session.add(new_thread)
     await session.commit()
@@ -281,47 +602,10 @@ async def create_thread(
     )
     session.add(new_chat_message)
     await session.commit()
-    background_tasks.add_task(set_title_for_thread, new_thread.id)
+    if get_settings().titles.mode == "inprocess":
+        get_title_worker().submit(new_thread.id)
     return CreateThreadResponse(
         thread_id=new_thread.id,
         create_time=new_thread.create_time,
         chat_history=[new_chat_message],
     )
-
-
-class ThreadTitleResult(BaseModel):
-    title: str
-
-
-async def set_title_for_thread(thread_id: str):
-    async with get_async_session() as session:
-        thread = await session.scalar(select(Thread).where(Thread.id == thread_id))
-        if not thread:
-            _logger.info(f"Thread {thread_id} not found")
-            return
-        if thread.title is None:
-            model = OpenAIModel(
-                model_name="o3-mini",
-                provider=OpenAIProvider(
-                    api_key=get_settings().appconfig.openai_api_key.get_secret_value()
-                ),
-            )
-            agent = Agent(model=model, instrument=True, result_type=ThreadTitleResult)
-            results = await session.execute(
-                select(ChatMessage)
-                .where(ChatMessage.thread_id == thread_id)
-                .where(ChatMessage.role == "user")
-                .order_by(ChatMessage.create_time.asc())
-                .limit(1)
-            )
-            [first_msg] = results.scalars().all()
-            prompt = f"""
-                Here is the first message in a chat thread from a user.
-                {first_msg.content}
-                Write a title for this chat thread in under 10 words.
-            """
-            result = await agent.run(prompt)
-            thread.title = result.data.title
-            await session.commit()
-        else:
-            _logger.info(f"Thread {thread_id} was assigned a title already. Exiting.")
@@ -1,7 +1,6 @@
 from fastapi import APIRouter, Depends
 
 from app.api import deps
-from app.models.user import User
 from app.schemas.responses import UserResponse
 
 router = APIRouter()
@@ -9,6 +8,6 @@ router = APIRouter()
 
 @router.get("/me", response_model=UserResponse, description="Get current user")
 async def read_current_user(
-    current_user: User = Depends(deps.get_current_user),
-) -> User:
+    current_user: deps.CurrentUser = Depends(deps.get_current_user),
+) -> deps.CurrentUser:
     return current_user
@@ -0,0 +1,15 @@
+from typing import Any
+
+from fastapi import APIRouter
+
+from app.core.security.jwt import get_key_ring
+
+router = APIRouter()
+
+
+@router.get(
+    "/jwks.json",
+    description="Public keys for verifying access tokens (RFC 7517)",
+)
+async def get_jwks() -> dict[str, Any]:
+    return get_key_ring().jwks()
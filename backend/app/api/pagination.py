@@ -0,0 +1,41 @@
+# Opaque keyset cursors for paginated listings.
+#
+# A cursor encodes the sort key of the last row of a page, e.g. (create_time, id),
+# so the next page is fetched with a "WHERE (create_time, id) < cursor" seek instead
+# of an OFFSET that has to scan and discard every previous page.
+
+import base64
+from datetime import datetime
+from typing import Any, Callable
+
+from fastapi import HTTPException, Response, status
+
+from app.api import api_messages
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(create_time: datetime, id: str | int) -> str:
+    raw = f"{create_time.isoformat()}|{id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(
+    cursor: str, parse_id: Callable[[str], Any] = str
+) -> tuple[datetime, Any]:
+    # parse_id must raise ValueError for ids of the wrong type, e.g. uuid.UUID,
+    # so a forged cursor is a 400 rather than a database error
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        create_time, id = raw.split("|", 1)
+        return datetime.fromisoformat(create_time), parse_id(id)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=api_messages.PAGINATION_CURSOR_INVALID,
+        )
+
+
+def set_next_cursor(response: Response, cursor: str | None) -> None:
+    if cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
@@ -0,0 +1,45 @@
+# Context window loading for chat turns.
+#
+# The newest messages of a thread are read in one descending query on the
+# (thread_id, create_time, id) index, trimmed to a token budget and reversed into
+# chronological order, so prompt size stays bounded however long a thread grows.
+
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.chat_message import ChatMessage
+
+# Rough average for English text; avoids running a tokenizer on every history read.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def context_window_query(thread_id: str, max_messages: int) -> Select:
+    return (
+        select(ChatMessage)
+        .where(ChatMessage.thread_id == thread_id)
+        .order_by(ChatMessage.create_time.desc(), ChatMessage.id.desc())
+        .limit(max_messages)
+    )
+
+
+async def load_context_window(
+    session: AsyncSession,
+    thread_id: str,
+    max_messages: int,
+    max_tokens: int,
+) -> list[ChatMessage]:
+    results = await session.scalars(context_window_query(thread_id, max_messages))
+    window: list[ChatMessage] = []
+    used_tokens = 0
+    for message in results:
+        used_tokens += estimate_tokens(message.content)
+        # the newest message is the prompt and is always kept
+        if window and used_tokens > max_tokens:
+            break
+        window.append(message)
+    window.reverse()
+    return window
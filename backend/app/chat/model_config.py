@@ -0,0 +1,101 @@
+# Chat model codes offered to clients and the settings stored on a thread.
+#
+# context_messages / context_token_budget bound the history sent with every turn:
+# at most that many of the most recent messages, trimmed further to fit the budget
+# (see app.chat.context).
+#
+# An entry may list equivalent "fallbacks" ({provider, name, base_url}) that are
+# used when its own backend is slow or failing, see app.core.llm_router.
+
+from app.core.config import get_settings
+from app.core.llm_router import ModelBackend
+
+DEFAULT_CONTEXT_MESSAGES = 20
+DEFAULT_CONTEXT_TOKEN_BUDGET = 8_000
+
+
+def get_model_config(model_name: str) -> dict | None:
+    model_code_config = {
+        "GPT_4O": {
+            "provider": "openai",
+            "name": "gpt-4o",
+            "context_messages": 40,
+            "context_token_budget": 16_000,
+        },
+        "GPT_4O_MINI": {
+            "provider": "openai",
+            "name": "gpt-4o-mini",
+            "context_messages": 40,
+            "context_token_budget": 16_000,
+        },
+        "O3_MINI": {
+            "provider": "openai",
+            "name": "o3-mini",
+            "context_messages": 20,
+            "context_token_budget": 16_000,
+        },
+        "GROQ_LLAMA_3_3_70B": {
+            "provider": "groq",
+            "name": "llama-3.3-70b-versatile",
+            "base_url": "https://api.groq.com/openai/v1",
+            "context_messages": 20,
+            "context_token_budget": 6_000,
+        },
+        "GROQ_DEEPSEEK_R1_DISTILL_LLAMA_3.3_70B": {
+            "provider": "groq",
+            "name": "deepseek-r1-distill-llama-70b",
+            "base_url": "https://api.groq.com/openai/v1",
+            "context_messages": 10,
+            "context_token_budget": 6_000,
+        },
+        "GEMINI_2.0_FLASH": {
+            "provider": "google",
+            "name": "gemini-2.0-flash",
+            "context_messages": 40,
+            "context_token_budget": 16_000,
+        },
+        "GEMINI_2.0_FLASH_LITE": {
+            "provider": "google",
+            "name": "gemini-2.0-flash-lite",
+            "context_messages": 40,
+            "context_token_budget": 16_000,
+        },
+    }
+    if model_name in model_code_config:
+        return model_code_config.get(model_name)
+    return None
+
+
+def get_context_limits(model_code: str | None) -> tuple[int, int]:
+    # Read from the current model table rather than the copy stored in
+    # thread.config, so tuning applies to existing threads too.
+    model_config = get_model_config(model_code) or {}
+    return (
+        model_config.get("context_messages", DEFAULT_CONTEXT_MESSAGES),
+        model_config.get("context_token_budget", DEFAULT_CONTEXT_TOKEN_BUDGET),
+    )
+
+
+def resolve_model_config(thread_config: dict) -> dict:
+    # Prefer the current entry for the thread's model code: older threads store
+    # a copy with a misspelled "provder" key for the Gemini models.
+    return get_model_config(thread_config.get("model_code")) or thread_config
+
+
+def get_model_backends(
+    model_config: dict, model_code: str | None
+) -> list[ModelBackend]:
+    # The resolved backend first, then its fallbacks in priority order.
+    entries = [
+        model_config,
+        *model_config.get("fallbacks", []),
+        *get_settings().routing.fallbacks.get(model_code or "", []),
+    ]
+    return [
+        ModelBackend(
+            entry.get("provider", "openai"),
+            entry.get("name", "gpt-4o-mini"),
+            entry.get("base_url"),
+        )
+        for entry in entries
+    ]
@@ -0,0 +1,154 @@
+# Opt-in cache of model answers for repeated prompts.
+#
+# Keyed by (model, system prompt, normalized message history). The exact tier
+# is a hash lookup. The optional similarity tier compares the newest user
+# message with earlier ones that had exactly the same model, system prompt and
+# preceding history, using a local hashed character n-gram embedding (no model
+# call, no extra dependency), and accepts the best match above the threshold.
+#
+# Entries expire after ttl_secs and the least recently used are evicted first.
+# The cache is per worker. Threads opt out with config["response_cache"] = False.
+# Hits are replayed through the normal streaming path, see generate_answer.
+
+import hashlib
+import json
+import math
+import re
+import zlib
+from collections.abc import AsyncIterator, Sequence
+from dataclasses import dataclass
+from functools import lru_cache
+
+from prometheus_client import Counter
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+
+RESPONSE_CACHE_LOOKUPS = Counter(
+    "response_cache_lookups_total",
+    "Response cache lookups by result",
+    ["result"],
+)
+
+# candidates kept per (model, system prompt, preceding history) for the
+# similarity tier
+MAX_SIMILAR_CANDIDATES = 32
+
+_WHITESPACE = re.compile(r"\s+")
+_CHUNK = re.compile(r"\S+\s*|\s+")
+
+
+def normalize_text(text: str) -> str:
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+
+class HashedNgramEmbedder:
+    # Character n-grams hashed into a fixed number of signed buckets and L2
+    # normalized, so the dot product of two vectors is their cosine similarity.
+
+    def __init__(self, dimensions: int = 256, n: int = 3) -> None:
+        self.dimensions = dimensions
+        self.n = n
+
+    def embed(self, text: str) -> list[float]:
+        text = f" {text} "
+        vector = [0.0] * self.dimensions
+        for i in range(max(len(text) - self.n + 1, 1)):
+            h = zlib.crc32(text[i : i + self.n].encode("utf-8"))
+            vector[h % self.dimensions] += 1.0 if h & 0x80000000 else -1.0
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+
+@dataclass(frozen=True, slots=True)
+class CacheLookup:
+    key: str
+    context_key: str
+    prompt: str
+
+
+def _digest(value) -> str:
+    payload = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_secs: float,
+        similarity_threshold: float | None = None,
+        embedder: HashedNgramEmbedder | None = None,
+    ) -> None:
+        self.similarity_threshold = similarity_threshold
+        self.embedder = embedder or HashedNgramEmbedder()
+        self._answers = TTLCache(max_size=max_entries, ttl=ttl_secs)
+        self._similar = TTLCache(max_size=max_entries, ttl=ttl_secs)
+
+    def lookup_for(
+        self,
+        model: Sequence[str | None],
+        system_prompt: str,
+        history: Sequence[tuple[str, str]],
+    ) -> CacheLookup:
+        # history is (role, content) pairs ending with the new user prompt
+        normalized = [(role, normalize_text(content)) for role, content in history]
+        context_key = _digest([list(model), system_prompt, normalized[:-1]])
+        prompt = normalized[-1][1] if normalized else ""
+        return CacheLookup(_digest([context_key, prompt]), context_key, prompt)
+
+    def get(self, lookup: CacheLookup) -> str | None:
+        answer = self._answers.get(lookup.key)
+        if answer is not None:
+            RESPONSE_CACHE_LOOKUPS.labels("exact_hit").inc()
+            return answer
+        if self.similarity_threshold is not None:
+            answer = self._get_similar(lookup)
+            if answer is not None:
+                RESPONSE_CACHE_LOOKUPS.labels("similar_hit").inc()
+                return answer
+        RESPONSE_CACHE_LOOKUPS.labels("miss").inc()
+        return None
+
+    def set(self, lookup: CacheLookup, answer: str) -> None:
+        self._answers.set(lookup.key, answer)
+        if self.similarity_threshold is None:
+            return
+        candidates = self._similar.get(lookup.context_key) or []
+        candidates = [c for c in candidates if c[0] != lookup.key]
+        candidates.append((lookup.key, self.embedder.embed(lookup.prompt)))
+        self._similar.set(lookup.context_key, candidates[-MAX_SIMILAR_CANDIDATES:])
+
+    def _get_similar(self, lookup: CacheLookup) -> str | None:
+        candidates = self._similar.get(lookup.context_key)
+        if not candidates:
+            return None
+        vector = self.embedder.embed(lookup.prompt)
+        best_score, best_answer = self.similarity_threshold, None
+        for key, candidate in candidates:
+            score = sum(a * b for a, b in zip(vector, candidate))
+            if score < best_score:
+                continue
+            # the exact entry may have expired or been evicted meanwhile
+            answer = self._answers.get(key)
+            if answer is not None:
+                best_score, best_answer = score, answer
+        return best_answer
+
+
+async def replay_chunks(answer: str) -> AsyncIterator[str]:
+    # a cached answer is fed to the stream word by word, like model output
+    for match in _CHUNK.finditer(answer):
+        yield match.group()
+
+
+@lru_cache(maxsize=1)
+def get_response_cache() -> ResponseCache | None:
+    config = get_settings().response_cache
+    if not config.enabled:
+        return None
+    return ResponseCache(
+        max_entries=config.max_entries,
+        ttl_secs=config.ttl_secs,
+        similarity_threshold=config.similarity_threshold,
+    )
@@ -0,0 +1,229 @@
+# Batched background title generation for new threads.
+#
+# create_thread only enqueues the thread id. The worker drains the bounded queue
+# in batches, asks the model for all titles of a batch in one structured-output
+# call (N first messages in, N titles out) and stores them with one bulk UPDATE.
+# A full queue never blocks a request: the thread simply stays untitled until the
+# sweeper picks it up.
+#
+# Runs in the API process (TITLES__MODE=inprocess, started from the lifespan),
+# where a low-frequency sweep also retries the threads dropped by the queue or by
+# a failed batch, or as a separate worker that polls for untitled threads:
+#
+#   python -m app.chat.titles
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+from prometheus_client import Gauge
+from pydantic import BaseModel
+from pydantic_ai import Agent
+from sqlalchemy import func, select, update
+
+from app.core.config import get_settings
+from app.core.database_session import get_async_session
+from app.core.llm import get_model_registry
+from app.core.logger import get_logger
+from app.models.chat_message import ChatMessage
+from app.models.thread import Thread
+
+_logger = get_logger(__name__)
+
+TITLE_QUEUE_DEPTH = Gauge("title_queue_depth", "Threads waiting for a title")
+
+# Only the start of a first message is needed to name a thread.
+FIRST_MESSAGE_MAX_CHARS = 500
+TITLE_MAX_CHARS = 100
+
+
+class ThreadTitle(BaseModel):
+    index: int
+    title: str
+
+
+class ThreadTitleBatchResult(BaseModel):
+    titles: list[ThreadTitle]
+
+
+def build_titles_prompt(first_messages: list[str]) -> str:
+    numbered = "\n".join(
+        f"{index}: {content[:FIRST_MESSAGE_MAX_CHARS]!r}"
+        for index, content in enumerate(first_messages)
+    )
+    return f"""
+        Here are the first messages of {len(first_messages)} chat threads from users,
+        one per line, prefixed with the thread index.
+        {numbered}
+        Write a title in under 10 words for every thread and return it with the
+        index of its thread.
+    """
+
+
+class TitleWorker:
+    def __init__(self, agent: Agent | None = None) -> None:
+        self.config = get_settings().titles
+        self._agent = agent
+        self._queue: asyncio.Queue[str] = asyncio.Queue(maxsize=self.config.queue_size)
+        self._task: asyncio.Task | None = None
+        self._sweeper: asyncio.Task | None = None
+        TITLE_QUEUE_DEPTH.set_function(self._queue.qsize)
+
+    @property
+    def agent(self) -> Agent:
+        if self._agent is None:
+            self._agent = get_model_registry().get_agent(
+                "openai", self.config.model_name, result_type=ThreadTitleBatchResult
+            )
+        return self._agent
+
+    def submit(self, thread_id: str) -> bool:
+        try:
+            self._queue.put_nowait(thread_id)
+            return True
+        except asyncio.QueueFull:
+            _logger.warning(f"Title queue full, thread {thread_id} left untitled")
+            return False
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        if self._sweeper is None:
+            # queued threads are younger than the sweep interval and left alone
+            interval = self.config.inprocess_sweep_interval_secs
+            self._sweeper = asyncio.create_task(
+                run_sweeper(self, poll_interval_secs=interval, min_age_secs=interval)
+            )
+
+    async def stop(self) -> None:
+        for task in (self._task, self._sweeper):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = self._sweeper = None
+
+    async def _next_batch(self) -> list[str]:
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.config.batch_wait_secs
+        while len(batch) < self.config.batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self.process_batch(batch)
+            except Exception:
+                _logger.exception(f"Title generation failed for threads {batch}")
+
+    async def process_batch(self, thread_ids: list[str]) -> dict[str, str]:
+        async with get_async_session() as session:
+            first_message_ids = (
+                select(func.min(ChatMessage.id))
+                .join(Thread, Thread.id == ChatMessage.thread_id)
+                .where(ChatMessage.thread_id.in_(thread_ids))
+                .where(ChatMessage.role == "user")
+                .where(Thread.title.is_(None))
+                .group_by(ChatMessage.thread_id)
+            )
+            rows = (
+                await session.execute(
+                    select(ChatMessage.thread_id, ChatMessage.content).where(
+                        ChatMessage.id.in_(first_message_ids)
+                    )
+                )
+            ).all()
+        if not rows:
+            return {}
+
+        result = await self._generate([row.content for row in rows])
+        titles = {
+            rows[item.index].thread_id: item.title.strip()[:TITLE_MAX_CHARS]
+            for item in result.titles
+            if 0 <= item.index < len(rows) and item.title.strip()
+        }
+        if titles:
+            async with get_async_session() as session:
+                # bulk UPDATE by primary key, never overwriting a title set meanwhile
+                await session.execute(
+                    update(Thread).where(Thread.title.is_(None)),
+                    [{"id": id, "title": title} for id, title in titles.items()],
+                    execution_options={"synchronize_session": None},
+                )
+                await session.commit()
+        _logger.info(f"Titled {len(titles)} of {len(rows)} threads")
+        return titles
+
+    async def _generate(self, first_messages: list[str]) -> ThreadTitleBatchResult:
+        prompt = build_titles_prompt(first_messages)
+        for attempt in range(self.config.max_retries + 1):
+            try:
+                return (await self.agent.run(prompt)).data
+            except Exception:
+                if attempt == self.config.max_retries:
+                    raise
+                delay = self.config.retry_backoff_secs * 2**attempt
+                _logger.warning(f"Title generation failed, retrying in {delay}s")
+                await asyncio.sleep(delay)
+
+
+@lru_cache(maxsize=1)
+def get_title_worker() -> TitleWorker:
+    return TitleWorker()
+
+
+async def run_sweeper(
+    worker: TitleWorker,
+    poll_interval_secs: float | None = None,
+    min_age_secs: float = 0,
+) -> None:
+    # Poll for recent untitled threads (served by the partial index
+    # ix_threads_untitled_create_time): the whole of external mode, and the retry
+    # of dropped threads in in-process mode.
+    if poll_interval_secs is None:
+        poll_interval_secs = worker.config.poll_interval_secs
+    failed: dict[str, datetime] = {}
+    while True:
+        now = datetime.now(timezone.utc)
+        since = now - timedelta(seconds=worker.config.sweep_window_secs)
+        until = now - timedelta(seconds=min_age_secs)
+        # threads created before the window are not polled anyway
+        failed = {
+            id: failed_at for id, failed_at in failed.items() if failed_at > since
+        }
+        async with get_async_session() as session:
+            query = (
+                select(Thread.id)
+                .where(Thread.title.is_(None))
+                .where(Thread.create_time > since)
+                .where(Thread.create_time <= until)
+                .order_by(Thread.create_time.asc())
+                .limit(worker.config.batch_size)
+            )
+            if failed:
+                query = query.where(Thread.id.not_in(failed))
+            thread_ids = (await session.scalars(query)).all()
+        if not thread_ids:
+            await asyncio.sleep(poll_interval_secs)
+            continue
+        try:
+            titles = await worker.process_batch(list(thread_ids))
+        except Exception:
+            _logger.exception(f"Title generation failed for threads {thread_ids}")
+            titles = {}
+        # do not poll the same threads forever if the model keeps failing on them
+        failed.update((id, now) for id in thread_ids if id not in titles)
+
+
+if __name__ == "__main__":
+    asyncio.run(run_sweeper(get_title_worker()))
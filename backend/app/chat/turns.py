@@ -0,0 +1,759 @@
+# Resumable chat turns for the SSE transport.
+#
+# A turn is one generated answer. Its generation runs as a task of its own rather
+# than as part of the HTTP response, and every event it produces is kept in a
+# per-turn ring buffer under an increasing sequence number. A subscriber replays
+# the buffer after the last sequence it has seen (the SSE Last-Event-ID) and then
+# follows the live tail, so a client that drops mid-answer reconnects without a
+# new LLM call. Text that has already left the ring buffer is replayed as a single
+# "snapshot" event carrying the whole answer up to that point, which replaces
+# whatever text the client had.
+#
+# Storage is pluggable through TurnStore. InMemoryTurnStore keeps turns in this
+# process only, so a resume has to reach the same worker; it needs no external
+# service and is what local runs and tests use. BroadcastTurnStore (below) fans
+# turns out to the other workers over app/core/pubsub.py.
+
+import asyncio
+import json
+import uuid
+import weakref
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass, replace
+from functools import lru_cache
+
+from prometheus_client import Gauge
+from pydantic import BaseModel
+
+from app.core.config import get_settings
+from app.core.logger import get_logger
+from app.core.metrics import current_turn_timer
+from app.core.pubsub import PubSub, get_pubsub
+from app.schemas.responses import (
+    ChatStreamDeltaResponse,
+    ChatStreamErrorResponse,
+    ChatStreamSnapshotResponse,
+)
+
+_logger = get_logger(__name__)
+
+CHAT_TURNS_RUNNING = Gauge(
+    "chat_turns_running", "Chat turns generating an answer", ["model_code"]
+)
+
+
+@dataclass(frozen=True, slots=True)
+class TurnEvent:
+    seq: int
+    event: str
+    data: str
+    # the answer text this event adds, kept for snapshots
+    text: str = ""
+
+
+@dataclass(frozen=True, slots=True)
+class TurnInfo:
+    # what claim needs to know of the latest turn of a thread, without its events
+    turn_id: str
+    idempotency_key: str | None
+    # sha256 of the prompt, for requests without an idempotency key
+    prompt_digest: str | None
+    finished: bool
+
+    def repeated_by(
+        self, idempotency_key: str | None, prompt_digest: str | None
+    ) -> bool:
+        # the same idempotency key, or without one the same prompt while it runs
+        if idempotency_key:
+            return idempotency_key == self.idempotency_key
+        return (
+            not self.finished
+            and prompt_digest is not None
+            and prompt_digest == self.prompt_digest
+        )
+
+
+class Turn(ABC):
+    def __init__(
+        self,
+        turn_id: str,
+        thread_id: str,
+        idempotency_key: str | None = None,
+        prompt_digest: str | None = None,
+    ) -> None:
+        self.turn_id = turn_id
+        self.thread_id = thread_id
+        self.idempotency_key = idempotency_key
+        self.prompt_digest = prompt_digest
+        self.finished = False
+
+    @abstractmethod
+    async def publish(self, event: str, data: str, text: str = "") -> TurnEvent: ...
+
+    @abstractmethod
+    async def finish(self) -> None: ...
+
+    @abstractmethod
+    def subscribe(self, after_seq: int = 0) -> AsyncIterator[TurnEvent]: ...
+
+    def info(self) -> TurnInfo:
+        return TurnInfo(
+            self.turn_id, self.idempotency_key, self.prompt_digest, self.finished
+        )
+
+    async def append_text(self, text: str) -> TurnEvent:
+        delta = ChatStreamDeltaResponse.model_construct(content=text)
+        return await self.publish("delta", delta.model_dump_json(), text)
+
+
+class TurnStore(ABC):
+    def __init__(self) -> None:
+        self._claim_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = (
+            weakref.WeakValueDictionary()
+        )
+
+    async def start(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+    @abstractmethod
+    async def create(
+        self,
+        thread_id: str,
+        idempotency_key: str | None = None,
+        prompt_digest: str | None = None,
+    ) -> Turn: ...
+
+    @abstractmethod
+    async def get(self, turn_id: str) -> Turn | None: ...
+
+    @abstractmethod
+    async def get_active(self, thread_id: str) -> Turn | None: ...
+
+    @abstractmethod
+    async def latest(self, thread_id: str) -> TurnInfo | None:
+        # the latest turn of the thread, cheaper than get_active
+        ...
+
+    @abstractmethod
+    async def discard(self, turn: Turn) -> None:
+        # stop returning a finished turn as the active turn of its thread
+        ...
+
+    async def claim(
+        self,
+        thread_id: str,
+        idempotency_key: str | None = None,
+        prompt_digest: str | None = None,
+    ) -> tuple[Turn | None, bool]:
+        # Single flight per thread. Returns the new turn and True, or the latest
+        # turn and False when the request repeats it (see TurnInfo.repeated_by),
+        # or None and False while another turn of the thread is running.
+        lock = self._claim_locks.get(thread_id)
+        if lock is None:
+            lock = self._claim_locks[thread_id] = asyncio.Lock()
+        async with lock:
+            info = await self.latest(thread_id)
+            if info is not None:
+                if info.repeated_by(idempotency_key, prompt_digest):
+                    turn = await self.get(info.turn_id)
+                    if turn is not None:
+                        return turn, False
+                elif not info.finished:
+                    return None, False
+            return await self.create(thread_id, idempotency_key, prompt_digest), True
+
+
+class InMemoryTurn(Turn):
+    def __init__(
+        self,
+        turn_id: str,
+        thread_id: str,
+        buffer_size: int,
+        on_finish: Callable[["InMemoryTurn"], None] | None = None,
+        idempotency_key: str | None = None,
+        prompt_digest: str | None = None,
+    ) -> None:
+        super().__init__(turn_id, thread_id, idempotency_key, prompt_digest)
+        self._on_finish = on_finish
+        self._events: deque[TurnEvent] = deque(maxlen=buffer_size)
+        self._last_seq = 0
+        self._evicted_text: list[str] = []
+        self._changed = asyncio.Event()
+
+    async def publish(self, event: str, data: str, text: str = "") -> TurnEvent:
+        turn_event = TurnEvent(self._last_seq + 1, event, data, text)
+        self._append(turn_event)
+        return turn_event
+
+    async def finish(self) -> None:
+        self.finished = True
+        self._notify()
+        if self._on_finish is not None:
+            self._on_finish(self)
+
+    def _append(self, turn_event: TurnEvent) -> None:
+        self._last_seq = turn_event.seq
+        if len(self._events) == self._events.maxlen:
+            self._evicted_text.append(self._events[0].text)
+        self._events.append(turn_event)
+        self._notify()
+
+    def _notify(self) -> None:
+        # wake current subscribers, later waits use a fresh event
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def replay(self, after_seq: int = 0) -> list[TurnEvent]:
+        events = list(self._events)
+        first_seq = events[0].seq if events else self._last_seq + 1
+        has_snapshot = bool(events) and events[0].event == "snapshot"
+        if after_seq < first_seq - 1 and not has_snapshot:
+            content = "".join(self._evicted_text)
+            snapshot = ChatStreamSnapshotResponse(content=content)
+            events.insert(
+                0,
+                TurnEvent(
+                    first_seq - 1, "snapshot", snapshot.model_dump_json(), content
+                ),
+            )
+        return [turn_event for turn_event in events if turn_event.seq > after_seq]
+
+    async def subscribe(self, after_seq: int = 0) -> AsyncIterator[TurnEvent]:
+        while True:
+            changed = self._changed
+            for turn_event in self.replay(after_seq):
+                after_seq = turn_event.seq
+                yield turn_event
+            if self.finished and after_seq >= self._last_seq:
+                return
+            if after_seq >= self._last_seq:
+                await changed.wait()
+
+
+class InMemoryTurnStore(TurnStore):
+    def __init__(self, buffer_size: int, retention_secs: float) -> None:
+        super().__init__()
+        self.buffer_size = buffer_size
+        self.retention_secs = retention_secs
+        self._turns: dict[str, InMemoryTurn] = {}
+        self._active: dict[str, str] = {}
+
+    async def create(
+        self,
+        thread_id: str,
+        idempotency_key: str | None = None,
+        prompt_digest: str | None = None,
+    ) -> Turn:
+        turn = InMemoryTurn(
+            uuid.uuid4().hex,
+            thread_id,
+            self.buffer_size,
+            self._expire_later,
+            idempotency_key,
+            prompt_digest,
+        )
+        self._turns[turn.turn_id] = turn
+        self._active[thread_id] = turn.turn_id
+        return turn
+
+    async def get(self, turn_id: str) -> Turn | None:
+        return self._turns.get(turn_id)
+
+    async def get_active(self, thread_id: str) -> Turn | None:
+        turn_id = self._active.get(thread_id)
+        return self._turns.get(turn_id) if turn_id else None
+
+    async def latest(self, thread_id: str) -> TurnInfo | None:
+        turn = await self.get_active(thread_id)
+        return turn.info() if turn is not None else None
+
+    async def discard(self, turn: Turn) -> None:
+        if self._active.get(turn.thread_id) == turn.turn_id:
+            del self._active[turn.thread_id]
+
+    def _expire_later(self, turn: InMemoryTurn) -> None:
+        # finished turns stay resumable for a while, then are dropped
+        def expire():
+            self._turns.pop(turn.turn_id, None)
+            if self._active.get(turn.thread_id) == turn.turn_id:
+                del self._active[turn.thread_id]
+
+        asyncio.get_running_loop().call_later(self.retention_secs, expire)
+
+
+# Cross-worker fan-out
+#
+# With a pub/sub backend every worker publishes the events of the turns it
+# produces on the channel "chat_turn_<turn_id>" and announces new turns on the
+# control channel. A worker asked for a turn it does not own subscribes to the
+# turn channel and sends a replay request; the owner answers on the turn channel
+# with its buffered events (a "start" marker first), then the live tail follows.
+# The mirror puts events back in sequence order, so replayed and live events may
+# interleave and arrive twice.
+#
+# Whether a thread has a running turn is answered from the "started", "finished"
+# and "discarded" ops of the control channel, without mirroring the turn. Before
+# a running turn of another worker blocks a new one, its owner is pinged, so a
+# dead owner does not block its thread.
+#
+# A turn is only broadcast once some worker asked for its replay, so turns nobody
+# follows elsewhere cost no NOTIFY per frame. Delivery is at most once and an
+# owner may die mid-answer: a mirror that hears nothing for turn_mirror_idle_secs
+# asks for a replay again (which also resends a lost finish) and is finished with
+# an error event when no owner answers.
+
+TURN_CONTROL_CHANNEL = "chat_turns"
+
+
+def turn_channel(turn_id: str) -> str:
+    return f"chat_turn_{turn_id}"
+
+
+def _event_message(turn_event: TurnEvent) -> str:
+    return json.dumps(
+        {
+            "kind": "event",
+            "seq": turn_event.seq,
+            "event": turn_event.event,
+            "data": turn_event.data,
+            "text": turn_event.text,
+        }
+    )
+
+
+class BroadcastTurn(InMemoryTurn):
+    def __init__(self, pubsub: PubSub, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._pubsub = pubsub
+        # set by the first replay request, i.e. once another worker mirrors it
+        self._watched = False
+
+    async def publish(self, event: str, data: str, text: str = "") -> TurnEvent:
+        turn_event = await super().publish(event, data, text)
+        if self._watched:
+            await self._broadcast(_event_message(turn_event))
+        return turn_event
+
+    async def finish(self) -> None:
+        await super().finish()
+        if self._watched:
+            await self._broadcast(json.dumps({"kind": "finish", "seq": self._last_seq}))
+        await self.publish_state()
+
+    async def publish_state(self) -> None:
+        # answers a ping on the control channel, resending a lost "finished"
+        op = "finished" if self.finished else "alive"
+        await self._broadcast(
+            json.dumps(
+                {"op": op, "turn_id": self.turn_id, "thread_id": self.thread_id}
+            ),
+            TURN_CONTROL_CHANNEL,
+        )
+
+    async def publish_replay(self) -> None:
+        self._watched = True
+        events = self.replay()
+        first_seq = events[0].seq if events else self._last_seq + 1
+        await self._broadcast(
+            json.dumps(
+                {
+                    "kind": "start",
+                    "seq": first_seq,
+                    "thread_id": self.thread_id,
+                    "idempotency_key": self.idempotency_key,
+                    "prompt_digest": self.prompt_digest,
+                }
+            )
+        )
+        for turn_event in events:
+            await self._broadcast(_event_message(turn_event))
+        if self.finished:
+            await self._broadcast(json.dumps({"kind": "finish", "seq": self._last_seq}))
+
+    async def _broadcast(self, message: str, channel: str | None = None) -> None:
+        # best effort: local subscribers must not fail with the pub/sub backend
+        try:
+            await self._pubsub.publish(channel or turn_channel(self.turn_id), message)
+        except Exception:
+            _logger.exception(f"Broadcast of chat turn {self.turn_id} failed")
+
+
+class MirroredTurn(InMemoryTurn):
+    # Local copy of a turn produced by another worker, fed from its channel.
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._next_seq: int | None = None
+        self._finish_seq: int | None = None
+        self._pending: dict[int, TurnEvent] = {}
+
+    async def publish(self, event: str, data: str, text: str = "") -> TurnEvent:
+        raise RuntimeError("Mirrored turns are read only")
+
+    async def fail(self, detail: str) -> None:
+        # ends the mirror locally when its owner is gone
+        error = ChatStreamErrorResponse(detail=detail)
+        self._append(TurnEvent(self._last_seq + 1, error.type, error.model_dump_json()))
+        await self.finish()
+
+    async def apply(self, message: dict) -> None:
+        kind = message["kind"]
+        if kind == "start":
+            if self._next_seq is None:
+                self._next_seq = message["seq"]
+        elif kind == "event":
+            if self._next_seq is None or message["seq"] >= self._next_seq:
+                self._pending[message["seq"]] = TurnEvent(
+                    message["seq"], message["event"], message["data"], message["text"]
+                )
+        elif kind == "finish":
+            self._finish_seq = message["seq"]
+
+        if self._next_seq is None:
+            return
+        while self._next_seq in self._pending:
+            self._append(self._pending.pop(self._next_seq))
+            self._next_seq += 1
+        if (
+            not self.finished
+            and self._finish_seq is not None
+            and self._next_seq > self._finish_seq
+        ):
+            await self.finish()
+
+
+class BroadcastTurnStore(InMemoryTurnStore):
+    def __init__(
+        self,
+        pubsub: PubSub,
+        buffer_size: int,
+        retention_secs: float,
+        replay_timeout_secs: float = 2.0,
+        mirror_idle_secs: float = 30.0,
+    ) -> None:
+        super().__init__(buffer_size, retention_secs)
+        self.pubsub = pubsub
+        self.replay_timeout_secs = replay_timeout_secs
+        self.mirror_idle_secs = mirror_idle_secs
+        self._mirrors: dict[str, MirroredTurn] = {}
+        # latest turn of each thread on any worker, from the control channel
+        self._thread_turns: dict[str, TurnInfo] = {}
+        self._mirror_locks: weakref.WeakValueDictionary[str, asyncio.Lock] = (
+            weakref.WeakValueDictionary()
+        )
+        # turn id -> answer of its owner to a ping
+        self._pings: dict[str, asyncio.Future] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._control: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self._control is None:
+            await self.pubsub.start()
+            started = asyncio.Event()
+            self._control = asyncio.create_task(self._follow_control(started))
+            await started.wait()
+
+    async def aclose(self) -> None:
+        for task in [self._control, *self._tasks]:
+            if task is not None:
+                task.cancel()
+        await self.pubsub.aclose()
+
+    async def create(
+        self,
+        thread_id: str,
+        idempotency_key: str | None = None,
+        prompt_digest: str | None = None,
+    ) -> Turn:
+        await self.start()
+        turn = BroadcastTurn(
+            self.pubsub,
+            uuid.uuid4().hex,
+            thread_id,
+            self.buffer_size,
+            self._expire_later,
+            idempotency_key,
+            prompt_digest,
+        )
+        self._turns[turn.turn_id] = turn
+        self._active[thread_id] = turn.turn_id
+        self._thread_turns[thread_id] = turn.info()
+        await self.pubsub.publish(
+            TURN_CONTROL_CHANNEL,
+            json.dumps(
+                {
+                    "op": "started",
+                    "turn_id": turn.turn_id,
+                    "thread_id": thread_id,
+                    "idempotency_key": idempotency_key,
+                    "prompt_digest": prompt_digest,
+                }
+            ),
+        )
+        return turn
+
+    async def get(self, turn_id: str) -> Turn | None:
+        turn = self._turns.get(turn_id) or self._mirrors.get(turn_id)
+        if turn is not None:
+            return turn
+        await self.start()
+        lock = self._mirror_locks.get(turn_id)
+        if lock is None:
+            lock = self._mirror_locks[turn_id] = asyncio.Lock()
+        async with lock:
+            if turn_id not in self._mirrors:
+                await self._mirror(turn_id)
+        return self._mirrors.get(turn_id)
+
+    async def get_active(self, thread_id: str) -> Turn | None:
+        info = await self.latest(thread_id)
+        return await self.get(info.turn_id) if info is not None else None
+
+    async def latest(self, thread_id: str) -> TurnInfo | None:
+        await self.start()
+        info = self._thread_turns.get(thread_id)
+        if info is None:
+            return None
+        turn = self._turns.get(info.turn_id) or self._mirrors.get(info.turn_id)
+        if turn is not None:
+            return turn.info()
+        if not info.finished and not await self._owner_alive(info.turn_id):
+            _logger.warning(f"Owner of chat turn {info.turn_id} is gone")
+            self._forget(thread_id, info.turn_id)
+        return self._thread_turns.get(thread_id)
+
+    async def discard(self, turn: Turn) -> None:
+        await super().discard(turn)
+        self._forget(turn.thread_id, turn.turn_id)
+        await self.pubsub.publish(
+            TURN_CONTROL_CHANNEL,
+            json.dumps(
+                {
+                    "op": "discarded",
+                    "turn_id": turn.turn_id,
+                    "thread_id": turn.thread_id,
+                }
+            ),
+        )
+
+    async def _mirror(self, turn_id: str) -> None:
+        ready = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(self._follow_turn(turn_id, ready))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        try:
+            await asyncio.wait_for(asyncio.shield(ready), self.replay_timeout_secs)
+        except asyncio.TimeoutError:
+            # no worker owns the turn (anymore)
+            task.cancel()
+            for thread_id, info in list(self._thread_turns.items()):
+                if info.turn_id == turn_id:
+                    self._forget(thread_id, turn_id)
+
+    async def _owner_alive(self, turn_id: str) -> bool:
+        answered = asyncio.get_running_loop().create_future()
+        self._pings[turn_id] = answered
+        try:
+            await self.pubsub.publish(
+                TURN_CONTROL_CHANNEL, json.dumps({"op": "ping", "turn_id": turn_id})
+            )
+            await asyncio.wait_for(answered, self.replay_timeout_secs)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            if self._pings.get(turn_id) is answered:
+                del self._pings[turn_id]
+
+    async def _request_replay(self, turn_id: str) -> None:
+        await self.pubsub.publish(
+            TURN_CONTROL_CHANNEL, json.dumps({"op": "replay", "turn_id": turn_id})
+        )
+
+    async def _follow_turn(self, turn_id: str, ready: asyncio.Future) -> None:
+        async with self.pubsub.subscribe(turn_channel(turn_id)) as subscription:
+            await self._request_replay(turn_id)
+            mirror = None
+            # live events may arrive before the owner's "start" marker
+            early: list[dict] = []
+            while True:
+                if mirror is None:
+                    raw = await subscription.get()
+                else:
+                    raw = await self._next_mirror_message(mirror, subscription)
+                    if raw is None:
+                        return
+                message = json.loads(raw)
+                if mirror is None:
+                    if message["kind"] != "start":
+                        early.append(message)
+                        continue
+                    mirror = MirroredTurn(
+                        turn_id,
+                        message["thread_id"],
+                        self.buffer_size,
+                        self._expire_mirror_later,
+                        message["idempotency_key"],
+                        message["prompt_digest"],
+                    )
+                    self._mirrors[turn_id] = mirror
+                    ready.set_result(None)
+                    await mirror.apply(message)
+                    for early_message in early:
+                        await mirror.apply(early_message)
+                else:
+                    await mirror.apply(message)
+                if mirror.finished:
+                    return
+
+    async def _next_mirror_message(
+        self, mirror: MirroredTurn, subscription
+    ) -> str | None:
+        try:
+            return await subscription.get(self.mirror_idle_secs)
+        except asyncio.TimeoutError:
+            pass
+        # silent for a while: the finish may have been lost, or the owner died
+        await self._request_replay(mirror.turn_id)
+        try:
+            return await subscription.get(self.replay_timeout_secs)
+        except asyncio.TimeoutError:
+            _logger.warning(f"Owner of chat turn {mirror.turn_id} is gone")
+            await mirror.fail("Answer generation was interrupted")
+            self._forget(mirror.thread_id, mirror.turn_id)
+            return None
+
+    async def _follow_control(self, started: asyncio.Event) -> None:
+        async with self.pubsub.subscribe(TURN_CONTROL_CHANNEL) as subscription:
+            started.set()
+            async for raw in subscription:
+                message = json.loads(raw)
+                op = message["op"]
+                if op in ("alive", "finished"):
+                    answered = self._pings.get(message["turn_id"])
+                    if answered is not None and not answered.done():
+                        answered.set_result(None)
+                if op == "started":
+                    self._thread_turns[message["thread_id"]] = TurnInfo(
+                        message["turn_id"],
+                        message["idempotency_key"],
+                        message["prompt_digest"],
+                        False,
+                    )
+                elif op == "finished":
+                    info = self._thread_turns.get(message["thread_id"])
+                    if info is not None and info.turn_id == message["turn_id"]:
+                        if not info.finished:
+                            self._thread_turns[message["thread_id"]] = replace(
+                                info, finished=True
+                            )
+                            asyncio.get_running_loop().call_later(
+                                self.retention_secs,
+                                self._forget,
+                                message["thread_id"],
+                                message["turn_id"],
+                            )
+                elif op == "discarded":
+                    self._forget(message["thread_id"], message["turn_id"])
+                elif op in ("replay", "ping"):
+                    turn = self._turns.get(message["turn_id"])
+                    if isinstance(turn, BroadcastTurn):
+                        if op == "replay":
+                            await turn.publish_replay()
+                        else:
+                            await turn.publish_state()
+
+    def _forget(self, thread_id: str, turn_id: str) -> None:
+        info = self._thread_turns.get(thread_id)
+        if info is not None and info.turn_id == turn_id:
+            del self._thread_turns[thread_id]
+
+    def _expire_mirror_later(self, turn: InMemoryTurn) -> None:
+        asyncio.get_running_loop().call_later(
+            self.retention_secs, self._mirrors.pop, turn.turn_id, None
+        )
+
+
+@lru_cache(maxsize=1)
+def get_turn_store() -> TurnStore:
+    streaming = get_settings().streaming
+    if streaming.pubsub == "none":
+        return InMemoryTurnStore(
+            buffer_size=streaming.turn_buffer_size,
+            retention_secs=streaming.turn_retention_secs,
+        )
+    return BroadcastTurnStore(
+        get_pubsub(),
+        buffer_size=streaming.turn_buffer_size,
+        retention_secs=streaming.turn_retention_secs,
+        mirror_idle_secs=streaming.turn_mirror_idle_secs,
+    )
+
+
+_running_turns: set[asyncio.Task] = set()
+
+
+async def run_turn(turn: Turn, answer: AsyncIterator[str | BaseModel]) -> None:
+    # Text chunks become delta events, any model (e.g. the final "done" frame) is
+    # published as an event named after its type.
+    timer = current_turn_timer.get()
+    model_code = (timer.model_code if timer else None) or "unknown"
+    CHAT_TURNS_RUNNING.labels(model_code).inc()
+    status = "cancelled"
+    try:
+        async for item in answer:
+            if isinstance(item, str):
+                await turn.append_text(item)
+            else:
+                await turn.publish(item.type, item.model_dump_json())
+        status = "ok"
+    except Exception:
+        status = "error"
+        _logger.exception(f"Chat turn {turn.turn_id} failed")
+        error = ChatStreamErrorResponse(detail="Answer generation failed")
+        await turn.publish(error.type, error.model_dump_json())
+    finally:
+        CHAT_TURNS_RUNNING.labels(model_code).dec()
+        await turn.finish()
+        if timer is not None:
+            timer.finish(status)
+
+
+def start_turn(turn: Turn, answer: AsyncIterator[str | BaseModel]) -> asyncio.Task:
+    # The task outlives the request that started it; keep a reference so it is
+    # not garbage collected mid-answer.
+    task = asyncio.create_task(run_turn(turn, answer))
+    _running_turns.add(task)
+    task.add_done_callback(_running_turns.discard)
+    return task
+
+
+async def cancel_running_turns() -> None:
+    for task in list(_running_turns):
+        task.cancel()
+    await asyncio.gather(*_running_turns, return_exceptions=True)
+
+
+def format_sse_event(turn_id: str, turn_event: TurnEvent) -> bytes:
+    return (
+        f"id: {turn_id}:{turn_event.seq}\n"
+        f"event: {turn_event.event}\n"
+        f"data: {turn_event.data}\n\n"
+    ).encode("utf-8")
+
+
+def parse_last_event_id(last_event_id: str) -> tuple[str, int] | None:
+    turn_id, _, seq = last_event_id.rpartition(":")
+    if not turn_id or not seq.isdigit():
+        return None
+    return turn_id, int(seq)
+
+
+async def stream_turn_events(turn: Turn, after_seq: int = 0):
+    async for turn_event in turn.subscribe(after_seq):
+        yield format_sse_event(turn.turn_id, turn_event)
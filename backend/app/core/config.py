@@ -16,6 +16,7 @@
 
 from functools import lru_cache
 from pathlib import Path
+from typing import Literal
 from urllib.parse import quote
 
 from pydantic import BaseModel, SecretStr, computed_field
@@ -31,9 +32,24 @@ _logger = get_logger(__name__)
 class Security(BaseModel):
     jwt_issuer: str = "meowwchat"
     jwt_secret_key: SecretStr
+    # HS256 (shared secret) or RS256 / EdDSA signed with jwt_private_key (PEM).
+    # jwt_public_keys maps kid -> PEM of keys still accepted after a rotation.
+    jwt_algorithm: str = "HS256"
+    jwt_signing_key_id: str = "default"
+    jwt_private_key: SecretStr | None = None
+    jwt_public_keys: dict[str, str] = {}
+    # with RS256 / EdDSA, still accept the kid-less HS256 tokens issued before;
+    # turn off once those have expired (jwt_access_token_expire_secs)
+    jwt_accept_legacy_hs256: bool = True
     jwt_access_token_expire_secs: int = 24 * 3600  # 1d
     refresh_token_expire_secs: int = 28 * 24 * 3600  # 28d
     password_bcrypt_rounds: int = 12
+    password_hash_workers: int = 4
+    password_hash_max_pending: int = 64
+    # in-process caches of verified tokens and authenticated users, see app/api/deps.py
+    token_cache_max_size: int = 10_000
+    user_cache_max_size: int = 10_000
+    user_cache_ttl_secs: int = 60
     allowed_hosts: list[str] = ["localhost", "127.0.0.1"]
     backend_cors_origins: list[str] = ["*"]
 
@@ -57,10 +73,130 @@ class AppConfig(BaseModel):
     openai_api_key: SecretStr
 
 
+class LLM(BaseModel):
+    # pooled http clients shared by all models of a provider, see app/core/llm.py
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry_secs: float = 60.0
+    connect_timeout_secs: float = 5.0
+    read_timeout_secs: float = 600.0
+    # OpenAI-compatible endpoint for "openai" models without a base_url of their
+    # own, e.g. a gateway or the fake provider of benchmarks/fake_openai.py
+    openai_base_url: str | None = None
+
+
+class Titles(BaseModel):
+    # thread title generation, see app/chat/titles.py
+    mode: Literal["inprocess", "external"] = "inprocess"
+    model_name: str = "o3-mini"
+    queue_size: int = 1_000
+    batch_size: int = 20
+    batch_wait_secs: float = 2.0
+    max_retries: int = 3
+    retry_backoff_secs: float = 1.0
+    poll_interval_secs: float = 5.0
+    sweep_window_secs: int = 24 * 3600
+    # in-process mode also sweeps, this often, for threads at least this old
+    # whose title was dropped (full queue, failed batch)
+    inprocess_sweep_interval_secs: float = 300.0
+
+
+class Streaming(BaseModel):
+    # coalescing of streamed chat text into frames, see app/core/stream_writer.py
+    flush_max_bytes: int = 2048
+    flush_max_latency_secs: float = 0.03
+    # resumable SSE turns, see app/chat/turns.py
+    turn_buffer_size: int = 1024
+    turn_retention_secs: float = 120.0
+    # fan-out of in-flight turns across workers, see app/core/pubsub.py
+    pubsub: Literal["none", "memory", "postgres"] = "none"
+    # a mirrored turn silent for this long asks its owner for a replay, and fails
+    # with an error event if the owner does not answer
+    turn_mirror_idle_secs: float = 30.0
+
+
+class ResponseCache(BaseModel):
+    # opt-in answer cache for repeated prompts, see app/chat/response_cache.py
+    enabled: bool = False
+    max_entries: int = 10_000
+    ttl_secs: float = 3600.0
+    # only conversations up to this many messages (prompt included) are cached
+    max_history_messages: int = 4
+    # cosine similarity of the similarity tier (around 0.9 for near-identical
+    # wording), None disables it
+    similarity_threshold: float | None = None
+
+
+class Routing(BaseModel):
+    # failover and hedging between equivalent backends, see app/core/llm_router.py
+    # extra backends per model code, after those of app/chat/model_config.py, e.g.
+    # {"GPT_4O_MINI": [{"provider": "openai", "name": "gpt-4o-mini", "base_url": ...}]}
+    fallbacks: dict[str, list[dict[str, str]]] = {}
+    ewma_alpha: float = 0.2
+    # assumed time to first token of a backend without samples
+    default_latency_secs: float = 1.0
+    # cost factor added per position in the priority list
+    priority_bias: float = 0.25
+    latency_window: int = 200
+    hedge: bool = False
+    hedge_percentile: float = 0.95
+    hedge_min_samples: int = 20
+    hedge_min_delay_secs: float = 0.5
+    hedge_default_delay_secs: float = 3.0
+
+
+class RateLimit(BaseModel):
+    # token buckets for chat turns, see app/core/rate_limit.py; 0 disables a limit
+    enabled: bool = True
+    user_requests_per_min: int = 30
+    user_tokens_per_min: int = 100_000
+    model_requests_per_min: int = 3_000
+    model_tokens_per_min: int = 2_000_000
+
+
+class LangGraph(BaseModel):
+    # checkpoints of the langgraph route, see app/langgraph/checkpointer.py
+    checkpointer: Literal["memory", "postgres"] = "postgres"
+    checkpoint_pool_size: int = 5
+    # create or migrate the checkpoint tables on first use, otherwise a deploy
+    # step runs python -m app.langgraph.checkpointer
+    checkpoint_setup: bool = False
+    # tool calls of one model step run concurrently, see app/langgraph/tool_node.py;
+    # the dicts override the defaults per tool name
+    tool_timeout_secs: float = 10.0
+    tool_timeouts: dict[str, float] = {}
+    # results are cached by tool and arguments, 0 disables caching
+    tool_cache_ttl_secs: float = 30.0
+    tool_cache_ttls: dict[str, float] = {}
+    tool_cache_max_size: int = 1_024
+    # converted messages of stateless requests, reused when the conversation
+    # comes back longer; 0 disables the cache
+    message_cache_size: int = 64
+    message_cache_ttl_secs: float = 600.0
+    # larger conversations are converted without the cache
+    message_cache_max_bytes: int = 1024 * 1024
+
+
+class Metrics(BaseModel):
+    # Prometheus endpoint /metrics, see app/core/metrics.py. It exposes model
+    # codes, traffic and latencies: keep it off the public origin (the reverse
+    # proxy must not route /metrics) and set a bearer token for the scraper.
+    enabled: bool = False
+    bearer_token: SecretStr | None = None
+
+
 class Settings(BaseSettings):
     security: Security
     appconfig: AppConfig
     database: Database
+    llm: LLM = LLM()
+    titles: Titles = Titles()
+    streaming: Streaming = Streaming()
+    response_cache: ResponseCache = ResponseCache()
+    rate_limit: RateLimit = RateLimit()
+    routing: Routing = Routing()
+    langgraph: LangGraph = LangGraph()
+    metrics: Metrics = Metrics()
     # storage: Storage
 
     @computed_field  # type: ignore[prop-decorator]
@@ -6,6 +6,11 @@
 # https://docs.sqlalchemy.org/en/20/core/pooling.html#sqlalchemy.pool.Pool
 
 
+import time
+
+from prometheus_client import Gauge
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.engine.url import URL
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
@@ -13,13 +18,52 @@ from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.config import get_settings
+from app.core.metrics import DB_POOL_CHECKOUT_SECONDS, observe_db_query
+
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out", "Connections currently checked out of the pool"
+)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    # _do_get waits for a free connection or opens a new one
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_SECONDS.observe(time.perf_counter() - started_at)
+
+
+# Statements of a connection run one at a time, so one start time per
+# connection is enough. A failed statement gets no after_cursor_execute; its
+# start time is dropped in handle_error so it is not left on the pooled
+# connection.
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started_at"] = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info.pop("query_started_at", None)
+    if started_at is not None:
+        observe_db_query(time.perf_counter() - started_at)
+
+
+@event.listens_for(Engine, "handle_error")
+def _drop_query_timer(exception_context):
+    if exception_context.connection is not None:
+        exception_context.connection.info.pop("query_started_at", None)
 
 
 def new_async_engine(uri: URL) -> AsyncEngine:
     return create_async_engine(
         uri,
+        poolclass=TimedQueuePool,
         pool_pre_ping=True,
         pool_size=5,
         max_overflow=10,
@@ -30,6 +74,7 @@ def new_async_engine(uri: URL) -> AsyncEngine:
 
 _ASYNC_ENGINE = new_async_engine(get_settings().sqlalchemy_database_uri)
 _ASYNC_SESSIONMAKER = async_sessionmaker(_ASYNC_ENGINE, expire_on_commit=False)
+DB_POOL_CHECKED_OUT.set_function(lambda: _ASYNC_ENGINE.pool.checkedout())
 
 
 def get_async_session() -> AsyncSession:  # pragma: no cover
@@ -0,0 +1,157 @@
+# Process-wide registry of LLM providers, models and agents.
+#
+# Every provider gets a pooled httpx.AsyncClient per (provider, base_url) that is
+# shared by all models and agents using it, so chat turns reuse keep-alive TCP/TLS
+# connections instead of paying for a new handshake each time. Clients are closed
+# from the FastAPI lifespan (see app/server.py).
+#
+# Google GLA mutates base_url and headers of the client it is given, which is why
+# clients are never shared across providers.
+#
+# get_chat_model returns LangChain chat models for the langgraph agent on the same
+# pooled clients.
+
+import httpx
+from langchain_openai import ChatOpenAI
+from pydantic_ai import Agent
+from pydantic_ai.models import Model
+from pydantic_ai.models.gemini import GeminiModel
+from pydantic_ai.models.openai import OpenAIModel
+from pydantic_ai.providers.google_gla import GoogleGLAProvider
+from pydantic_ai.providers.openai import OpenAIProvider
+
+from app.core.config import get_settings
+from app.core.logger import get_logger
+from app.core.metrics import llm_http_event_hooks
+
+_logger = get_logger(__name__)
+
+
+class UnsupportedProviderError(ValueError):
+    pass
+
+
+class ModelRegistry:
+    def __init__(self) -> None:
+        self._http_clients: dict[tuple[str, str | None], httpx.AsyncClient] = {}
+        self._models: dict[tuple[str, str, str | None], Model] = {}
+        self._agents: dict[tuple, Agent] = {}
+        self._chat_models: dict[tuple[str, str, str | None], ChatOpenAI] = {}
+
+    def get_http_client(
+        self, provider: str, base_url: str | None = None
+    ) -> httpx.AsyncClient:
+        key = (provider, base_url)
+        client = self._http_clients.get(key)
+        if client is None or client.is_closed:
+            client_config = get_settings().llm
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(
+                    client_config.read_timeout_secs,
+                    connect=client_config.connect_timeout_secs,
+                ),
+                limits=httpx.Limits(
+                    max_connections=client_config.max_connections,
+                    max_keepalive_connections=client_config.max_keepalive_connections,
+                    keepalive_expiry=client_config.keepalive_expiry_secs,
+                ),
+                event_hooks=llm_http_event_hooks(provider),
+            )
+            self._http_clients[key] = client
+        return client
+
+    def get_model(
+        self, provider: str, model_name: str, base_url: str | None = None
+    ) -> Model:
+        key = (provider, model_name, base_url)
+        model = self._models.get(key)
+        if model is None:
+            model = self._new_model(provider, model_name, base_url)
+            self._models[key] = model
+        return model
+
+    def get_agent(
+        self,
+        provider: str,
+        model_name: str,
+        base_url: str | None = None,
+        result_type: type = str,
+    ) -> Agent:
+        key = (provider, model_name, base_url, result_type)
+        agent = self._agents.get(key)
+        if agent is None:
+            agent = Agent(
+                model=self.get_model(provider, model_name, base_url),
+                instrument=True,
+                result_type=result_type,
+            )
+            self._agents[key] = agent
+        return agent
+
+    def get_chat_model(
+        self, provider: str, model_name: str, base_url: str | None = None
+    ) -> ChatOpenAI:
+        key = (provider, model_name, base_url)
+        chat_model = self._chat_models.get(key)
+        if chat_model is None:
+            if provider not in ("openai", "groq"):
+                raise UnsupportedProviderError(f"Unsupported LLM provider: {provider}")
+            chat_model = ChatOpenAI(
+                model=model_name,
+                api_key=self._api_key(provider),
+                base_url=self._base_url(provider, base_url),
+                http_async_client=self.get_http_client(provider, base_url),
+                streaming=True,
+                stream_usage=True,
+            )
+            self._chat_models[key] = chat_model
+        return chat_model
+
+    def _api_key(self, provider: str) -> str:
+        app_config = get_settings().appconfig
+        return (
+            app_config.groq_api_key if provider == "groq" else app_config.openai_api_key
+        ).get_secret_value()
+
+    def _base_url(self, provider: str, base_url: str | None) -> str | None:
+        if provider == "openai" and base_url is None:
+            return get_settings().llm.openai_base_url
+        return base_url
+
+    def _new_model(self, provider: str, model_name: str, base_url: str | None) -> Model:
+        app_config = get_settings().appconfig
+        http_client = self.get_http_client(provider, base_url)
+        if provider == "google":
+            return GeminiModel(
+                model_name=model_name,
+                provider=GoogleGLAProvider(
+                    api_key=app_config.gemini_api_key.get_secret_value(),
+                    http_client=http_client,
+                ),
+            )
+        if provider in ("openai", "groq"):
+            return OpenAIModel(
+                model_name=model_name,
+                provider=OpenAIProvider(
+                    api_key=self._api_key(provider),
+                    base_url=self._base_url(provider, base_url),
+                    http_client=http_client,
+                ),
+            )
+        raise UnsupportedProviderError(f"Unsupported LLM provider: {provider}")
+
+    async def aclose(self) -> None:
+        for (provider, base_url), client in self._http_clients.items():
+            _logger.info(f"closing http client for {provider} {base_url or ''}")
+            await client.aclose()
+        self._http_clients.clear()
+        self._models.clear()
+        self._agents.clear()
+        self._chat_models.clear()
+
+
+_MODEL_REGISTRY = ModelRegistry()
+
+
+def get_model_registry() -> ModelRegistry:
+    return _MODEL_REGISTRY
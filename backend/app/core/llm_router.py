@@ -0,0 +1,260 @@
+# Failover and hedging between equivalent model backends.
+#
+# A model code can be served by several backends (provider, model, base_url) in
+# priority order. LLMRouter keeps per backend an EWMA of the time to first token
+# and of the error rate, and tries backends by expected latency, with a bias
+# toward the configured priority so that traffic does not flap between backends
+# with similar numbers. Statistics are per worker.
+#
+# routed_run_stream starts the best backend and fails over to the next one when
+# a run fails before its first token. With hedging enabled, the next backend is
+# also started when the first token is late, i.e. past the p95 time to first
+# token of the backend being waited on, and whichever streams first is used;
+# the other run is cancelled. Once text was streamed there is no failover.
+
+import asyncio
+from collections import deque
+from collections.abc import AsyncIterator, Sequence
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import lru_cache
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage
+from pydantic_ai.usage import Usage, UsageLimits
+
+from app.core.config import Routing, get_settings
+from app.core.logger import get_logger
+
+_logger = get_logger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class ModelBackend:
+    provider: str
+    name: str
+    base_url: str | None = None
+
+
+class BackendStats:
+    def __init__(self, alpha: float, window: int) -> None:
+        self.alpha = alpha
+        self.latency_secs: float | None = None
+        self.error_rate = 0.0
+        self.samples: deque[float] = deque(maxlen=window)
+
+    def observe_latency(self, secs: float) -> None:
+        if self.latency_secs is None:
+            self.latency_secs = secs
+        else:
+            self.latency_secs += self.alpha * (secs - self.latency_secs)
+        self.samples.append(secs)
+
+    def observe_outcome(self, failed: bool) -> None:
+        self.error_rate += self.alpha * (float(failed) - self.error_rate)
+
+    def percentile(self, q: float) -> float:
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+class LLMRouter:
+    def __init__(self, config: Routing) -> None:
+        self.config = config
+        self._stats: dict[ModelBackend, BackendStats] = {}
+
+    def stats(self, backend: ModelBackend) -> BackendStats:
+        stats = self._stats.get(backend)
+        if stats is None:
+            stats = self._stats[backend] = BackendStats(
+                self.config.ewma_alpha, self.config.latency_window
+            )
+        return stats
+
+    def order(self, backends: Sequence[ModelBackend]) -> list[ModelBackend]:
+        def expected_cost(item: tuple[int, ModelBackend]) -> float:
+            priority, backend = item
+            stats = self.stats(backend)
+            latency = stats.latency_secs
+            if latency is None:
+                latency = self.config.default_latency_secs
+            # a backend failing half of its runs costs about two attempts
+            cost = latency / max(1.0 - stats.error_rate, 0.05)
+            return cost * (1.0 + self.config.priority_bias * priority)
+
+        return [
+            backend for _, backend in sorted(enumerate(backends), key=expected_cost)
+        ]
+
+    def hedge_delay(self, backend: ModelBackend) -> float | None:
+        if not self.config.hedge:
+            return None
+        stats = self.stats(backend)
+        if len(stats.samples) < self.config.hedge_min_samples:
+            return self.config.hedge_default_delay_secs
+        return max(
+            self.config.hedge_min_delay_secs,
+            stats.percentile(self.config.hedge_percentile),
+        )
+
+
+_END = object()
+
+
+class _Attempt:
+    def __init__(self, backend: ModelBackend, agent: Agent, stats: BackendStats):
+        self.backend = backend
+        self.agent = agent
+        self.stats = stats
+        loop = asyncio.get_running_loop()
+        self.started_at = loop.time()
+        # resolves with the time to first token, or the error of a failed start
+        self.first_token: asyncio.Future[float] = loop.create_future()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.usage: Usage | None = None
+        self.content = ""
+        self.task: asyncio.Task | None = None
+
+    def _got_first_token(self) -> None:
+        if not self.first_token.done():
+            elapsed = asyncio.get_running_loop().time() - self.started_at
+            self.stats.observe_latency(elapsed)
+            self.first_token.set_result(elapsed)
+
+    async def run(
+        self,
+        prompt: str,
+        message_history: list[ModelMessage],
+        usage_limits: UsageLimits | None,
+    ) -> None:
+        try:
+            async with self.agent.run_stream(
+                prompt, message_history=message_history, usage_limits=usage_limits
+            ) as result:
+                async for text in result.stream_text(delta=True, debounce_by=None):
+                    self._got_first_token()
+                    self.queue.put_nowait(text)
+                self.usage = result.usage()
+                self.content = result.new_messages()[-1].parts[0].content
+            self._got_first_token()
+            self.queue.put_nowait(_END)
+            self.stats.observe_outcome(failed=False)
+        except Exception as exc:
+            self.stats.observe_outcome(failed=True)
+            if self.first_token.done():
+                self.queue.put_nowait(exc)
+            else:
+                self.first_token.set_exception(exc)
+        finally:
+            if not self.first_token.done():
+                self.first_token.cancel()
+
+    def abandon(self) -> None:
+        # a slower run that lost the race took at least this long
+        if not self.first_token.done():
+            elapsed = asyncio.get_running_loop().time() - self.started_at
+            self.stats.observe_latency(elapsed)
+        self.task.cancel()
+
+
+class RoutedRun:
+    def __init__(self, attempt: _Attempt) -> None:
+        self._attempt = attempt
+        self.backend = attempt.backend
+
+    async def stream_text(self) -> AsyncIterator[str]:
+        while True:
+            item = await self._attempt.queue.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    def usage(self) -> Usage:
+        return self._attempt.usage or Usage()
+
+    @property
+    def content(self) -> str:
+        return self._attempt.content
+
+
+@asynccontextmanager
+async def routed_run_stream(
+    candidates: Sequence[tuple[ModelBackend, Agent]],
+    prompt: str,
+    *,
+    message_history: list[ModelMessage],
+    usage_limits: UsageLimits | None = None,
+    router: LLMRouter | None = None,
+) -> AsyncIterator[RoutedRun]:
+    router = router or get_llm_router()
+    agents = dict(candidates)
+    pending = router.order(list(agents))
+    attempts: list[_Attempt] = []
+    winner: _Attempt | None = None
+    last_error: BaseException | None = None
+    loop = asyncio.get_running_loop()
+
+    def start_next() -> None:
+        backend = pending.pop(0)
+        attempt = _Attempt(backend, agents[backend], router.stats(backend))
+        attempt.task = asyncio.create_task(
+            attempt.run(prompt, message_history, usage_limits)
+        )
+        if attempts:
+            _logger.info(f"starting {backend.provider} {backend.name} as fallback")
+        attempts.append(attempt)
+
+    try:
+        while winner is None:
+            waiting = [a for a in attempts if not a.first_token.done()]
+            if not waiting:
+                if not pending:
+                    raise last_error
+                start_next()
+                continue
+            timeout = None
+            if pending:
+                delay = router.hedge_delay(waiting[-1].backend)
+                if delay is not None:
+                    timeout = max(waiting[-1].started_at + delay - loop.time(), 0)
+            await asyncio.wait(
+                [a.first_token for a in waiting],
+                timeout=timeout,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not any(a.first_token.done() for a in waiting):
+                # the first token is late, hedge with the next backend
+                start_next()
+                continue
+            for attempt in waiting:
+                if not attempt.first_token.done():
+                    continue
+                if attempt.first_token.cancelled():
+                    continue
+                error = attempt.first_token.exception()
+                if error is not None:
+                    backend = attempt.backend
+                    _logger.warning(
+                        f"{backend.provider} {backend.name} failed before streaming: "
+                        f"{error!r}"
+                    )
+                    last_error = error
+                elif winner is None:
+                    winner = attempt
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.abandon()
+        yield RoutedRun(winner)
+    finally:
+        for attempt in attempts:
+            attempt.task.cancel()
+        await asyncio.gather(
+            *(attempt.task for attempt in attempts), return_exceptions=True
+        )
+
+
+@lru_cache(maxsize=1)
+def get_llm_router() -> LLMRouter:
+    return LLMRouter(get_settings().routing)
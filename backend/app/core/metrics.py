@@ -0,0 +1,205 @@
+# Latency metrics of chat turns, exported on /metrics when metrics.enabled is set
+# (see app/server.py and metrics_app below).
+#
+# A TurnTimer is created when a chat request arrives and is kept in a context
+# variable, so the SQL hooks, the LLM http client and the generation task (which
+# copies the context) add to it without it being passed around. mark(stage)
+# closes a stage that began at the previous mark:
+#
+#   auth -> history -> provider_connect -> first_token -> generation -> persist
+#
+# provider_connect ends when the provider sent its response headers and is
+# missing for cached answers. finish() observes the histograms, labeled by
+# model_code, and writes one structured log record for the turn.
+
+import hmac
+import json
+import time
+from contextvars import ContextVar
+from functools import wraps
+
+import httpx
+from prometheus_client import Histogram, make_asgi_app
+from starlette.responses import PlainTextResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.logger import get_logger
+
+_logger = get_logger("app.turns")
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60, 120)
+
+CHAT_STAGE_SECONDS = Histogram(
+    "chat_turn_stage_seconds",
+    "Duration of the stages of a chat turn",
+    ["stage", "model_code"],
+    buckets=LATENCY_BUCKETS,
+)
+CHAT_TTFT_SECONDS = Histogram(
+    "chat_time_to_first_token_seconds",
+    "Time from the chat request to the first token of the answer",
+    ["model_code"],
+    buckets=LATENCY_BUCKETS,
+)
+CHAT_TOKENS_PER_SECOND = Histogram(
+    "chat_output_tokens_per_second",
+    "Answer tokens per second after the first token",
+    ["model_code"],
+    buckets=(5, 10, 20, 30, 50, 75, 100, 150, 200, 300, 500, 1000),
+)
+CHAT_DB_SECONDS = Histogram(
+    "chat_turn_db_seconds",
+    "SQL time spent by a chat turn",
+    ["model_code"],
+)
+DB_QUERY_SECONDS = Histogram(
+    "db_query_seconds",
+    "Execution time of SQL statements",
+)
+DB_POOL_CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds",
+    "Time to get a connection from the pool, waiting and connecting included",
+)
+LLM_RESPONSE_HEADERS_SECONDS = Histogram(
+    "llm_response_headers_seconds",
+    "Time until an LLM provider sent its response headers",
+    ["provider"],
+    buckets=LATENCY_BUCKETS,
+)
+GRAPH_NODE_SECONDS = Histogram(
+    "graph_node_seconds",
+    "Duration of langgraph node runs",
+    ["node"],
+    buckets=LATENCY_BUCKETS,
+)
+
+GRAPH_TOOL_SECONDS = Histogram(
+    "graph_tool_seconds",
+    "Duration of tool calls in the langgraph tools node",
+    ["tool", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def log_event(event: str, **fields) -> None:
+    _logger.info(json.dumps({"event": event, **fields}, default=str))
+
+
+class TurnTimer:
+    def __init__(self, kind: str = "chat") -> None:
+        self.kind = kind
+        self.model_code: str | None = None
+        self.started_at = self._last_mark = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self.db_secs = 0.0
+        self.response_tokens: int | None = None
+        # extra fields of the log record, e.g. thread_id or backend
+        self.fields: dict = {}
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + now - self._last_mark
+        self._last_mark = now
+
+    def mark_once(self, stage: str) -> None:
+        if stage not in self.stages:
+            self.mark(stage)
+
+    def first_token(self) -> None:
+        if "first_token" not in self.stages:
+            self.mark("first_token")
+            self.fields["ttft_secs"] = round(time.perf_counter() - self.started_at, 4)
+
+    def finish(self, status: str) -> None:
+        label = self.model_code or "unknown"
+        for stage, secs in self.stages.items():
+            CHAT_STAGE_SECONDS.labels(stage, label).observe(secs)
+        if "ttft_secs" in self.fields:
+            CHAT_TTFT_SECONDS.labels(label).observe(self.fields["ttft_secs"])
+        tokens_per_sec = None
+        generation_secs = self.stages.get("generation")
+        if self.response_tokens and generation_secs:
+            tokens_per_sec = round(self.response_tokens / generation_secs, 1)
+            CHAT_TOKENS_PER_SECOND.labels(label).observe(tokens_per_sec)
+        CHAT_DB_SECONDS.labels(label).observe(self.db_secs)
+        log_event(
+            f"{self.kind}_turn",
+            status=status,
+            model_code=self.model_code,
+            total_secs=round(time.perf_counter() - self.started_at, 4),
+            stages={stage: round(secs, 4) for stage, secs in self.stages.items()},
+            db_secs=round(self.db_secs, 4),
+            response_tokens=self.response_tokens,
+            tokens_per_sec=tokens_per_sec,
+            **self.fields,
+        )
+
+
+current_turn_timer: ContextVar[TurnTimer | None] = ContextVar(
+    "current_turn_timer", default=None
+)
+
+
+async def start_turn_timer() -> TurnTimer:
+    # FastAPI dependency; declared before the auth dependencies of a route, the
+    # "auth" stage covers them.
+    timer = TurnTimer()
+    current_turn_timer.set(timer)
+    return timer
+
+
+def observe_db_query(secs: float) -> None:
+    DB_QUERY_SECONDS.observe(secs)
+    timer = current_turn_timer.get()
+    if timer is not None:
+        timer.db_secs += secs
+
+
+def llm_http_event_hooks(provider: str) -> dict:
+    async def on_request(request: httpx.Request) -> None:
+        request.extensions["metrics_started_at"] = time.perf_counter()
+
+    async def on_response(response: httpx.Response) -> None:
+        started_at = response.request.extensions.get("metrics_started_at")
+        if started_at is not None:
+            secs = time.perf_counter() - started_at
+            LLM_RESPONSE_HEADERS_SECONDS.labels(provider).observe(secs)
+        timer = current_turn_timer.get()
+        if timer is not None:
+            timer.mark_once("provider_connect")
+
+    return {"request": [on_request], "response": [on_response]}
+
+
+def timed_node(name: str, node):
+    # wraps keeps the signature, langgraph passes config only to nodes taking it
+    @wraps(node)
+    async def run(*args, **kwargs):
+        started_at = time.perf_counter()
+        try:
+            return await node(*args, **kwargs)
+        finally:
+            GRAPH_NODE_SECONDS.labels(name).observe(time.perf_counter() - started_at)
+
+    return run
+
+
+def metrics_app(bearer_token: str | None = None) -> ASGIApp:
+    # the Prometheus ASGI app, requiring "Authorization: Bearer <token>" if set
+    prometheus_app = make_asgi_app()
+    if bearer_token is None:
+        return prometheus_app
+    expected = f"Bearer {bearer_token}".encode()
+
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            authorization = dict(scope["headers"]).get(b"authorization", b"")
+            if not hmac.compare_digest(authorization, expected):
+                response = PlainTextResponse(
+                    "Unauthorized", 401, headers={"WWW-Authenticate": "Bearer"}
+                )
+                await response(scope, receive, send)
+                return
+        await prometheus_app(scope, receive, send)
+
+    return app
@@ -0,0 +1,212 @@
+# Publish/subscribe of short string messages between uvicorn workers.
+#
+# InMemoryPubSub delivers within the current process only and is meant for tests
+# and single-worker runs. PostgresPubSub uses LISTEN/NOTIFY on the database we
+# already run: one dedicated connection LISTENs to every channel with local
+# subscribers, another sends NOTIFY. Neither counts against the SQLAlchemy pool.
+#
+# NOTIFY payloads are limited to 8000 bytes, so longer messages are split into
+# fragments and reassembled by the listener. Delivery is at most once: messages
+# published while a worker is not listening (e.g. reconnecting) are lost.
+
+import asyncio
+import itertools
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+import asyncpg
+
+from app.core.config import get_settings
+from app.core.logger import get_logger
+
+_logger = get_logger(__name__)
+
+
+class PubSub(ABC):
+    def __init__(self) -> None:
+        self._subscribers: dict[str, set[asyncio.Queue[str]]] = {}
+
+    @abstractmethod
+    async def publish(self, channel: str, message: str) -> None: ...
+
+    async def start(self) -> None:
+        pass
+
+    async def aclose(self) -> None:
+        pass
+
+    async def _listen(self, channel: str) -> None:
+        pass
+
+    async def _unlisten(self, channel: str) -> None:
+        pass
+
+    @asynccontextmanager
+    async def subscribe(self, channel: str) -> AsyncIterator["Subscription"]:
+        # Messages published after this returns are delivered to the subscription.
+        queue: asyncio.Queue[str] = asyncio.Queue()
+        queues = self._subscribers.setdefault(channel, set())
+        queues.add(queue)
+        try:
+            if len(queues) == 1:
+                await self._listen(channel)
+            yield Subscription(queue)
+        finally:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[channel]
+                await self._unlisten(channel)
+
+    def _dispatch(self, channel: str, message: str) -> None:
+        for queue in self._subscribers.get(channel, ()):
+            queue.put_nowait(message)
+
+
+class Subscription:
+    def __init__(self, queue: asyncio.Queue[str]) -> None:
+        self._queue = queue
+
+    async def get(self, timeout: float | None = None) -> str:
+        return await asyncio.wait_for(self._queue.get(), timeout)
+
+    def __aiter__(self) -> "Subscription":
+        return self
+
+    async def __anext__(self) -> str:
+        return await self._queue.get()
+
+
+class InMemoryPubSub(PubSub):
+    async def publish(self, channel: str, message: str) -> None:
+        self._dispatch(channel, message)
+
+
+# Leaves room below the 8000 byte limit for the fragment header.
+NOTIFY_MAX_BYTES = 7900
+_WHOLE = "="
+_FRAGMENT = "+"
+# incomplete messages (a fragment was lost) are dropped after this long
+FRAGMENT_TTL_SECS = 30.0
+
+
+def _split_payload(message: str) -> list[str]:
+    if len(message.encode("utf-8")) <= NOTIFY_MAX_BYTES:
+        return [_WHOLE + message]
+    # 4 bytes is the longest UTF-8 encoding of a character
+    size = NOTIFY_MAX_BYTES // 4
+    pieces = [message[i : i + size] for i in range(0, len(message), size)]
+    message_id = uuid.uuid4().hex[:12]
+    return [
+        f"{_FRAGMENT}{message_id}:{index}:{len(pieces)}:{piece}"
+        for index, piece in enumerate(pieces)
+    ]
+
+
+class PostgresPubSub(PubSub):
+    def __init__(self, dsn: str, reconnect_delay_secs: float = 1.0) -> None:
+        super().__init__()
+        self.dsn = dsn
+        self.reconnect_delay_secs = reconnect_delay_secs
+        self._listener: asyncpg.Connection | None = None
+        self._publisher: asyncpg.Connection | None = None
+        self._publish_lock = asyncio.Lock()
+        self._listener_lock = asyncio.Lock()
+        # message id -> (first fragment received at, fragments), oldest first
+        self._fragments: OrderedDict[str, tuple[float, list[str | None]]] = (
+            OrderedDict()
+        )
+        self._closed = False
+
+    async def start(self) -> None:
+        await self._connect_listener()
+
+    async def aclose(self) -> None:
+        self._closed = True
+        for connection in (self._listener, self._publisher):
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+
+    async def publish(self, channel: str, message: str) -> None:
+        async with self._publish_lock:
+            if self._publisher is None or self._publisher.is_closed():
+                self._publisher = await asyncpg.connect(self.dsn)
+            for payload in _split_payload(message):
+                await self._publisher.execute(
+                    "SELECT pg_notify($1, $2)", channel, payload
+                )
+
+    async def _connect_listener(self) -> None:
+        async with self._listener_lock:
+            await self._ensure_listener()
+
+    async def _ensure_listener(self) -> None:
+        # LISTEN and UNLISTEN run as queries on the listener connection, which
+        # runs one at a time: callers hold _listener_lock
+        if self._listener is not None and not self._listener.is_closed():
+            return
+        self._listener = await asyncpg.connect(self.dsn)
+        self._listener.add_termination_listener(self._on_listener_lost)
+        for channel in list(self._subscribers):
+            await self._listener.add_listener(channel, self._on_notify)
+
+    def _on_listener_lost(self, connection: asyncpg.Connection) -> None:
+        if not self._closed:
+            _logger.warning("Pub/sub listener connection lost, reconnecting")
+            asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        for attempt in itertools.count():
+            if self._closed:
+                return
+            try:
+                await self._connect_listener()
+                return
+            except (OSError, asyncpg.PostgresError):
+                _logger.warning(f"Pub/sub reconnect attempt {attempt + 1} failed")
+                await asyncio.sleep(self.reconnect_delay_secs)
+
+    async def _listen(self, channel: str) -> None:
+        async with self._listener_lock:
+            await self._ensure_listener()
+            await self._listener.add_listener(channel, self._on_notify)
+
+    async def _unlisten(self, channel: str) -> None:
+        async with self._listener_lock:
+            # subscribed again while waiting for the lock
+            if channel in self._subscribers:
+                return
+            if self._listener is not None and not self._listener.is_closed():
+                await self._listener.remove_listener(channel, self._on_notify)
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        if payload.startswith(_WHOLE):
+            self._dispatch(channel, payload[1:])
+            return
+        message_id, index, count, piece = payload[1:].split(":", 3)
+        now = time.monotonic()
+        while self._fragments:
+            received_at, _ = next(iter(self._fragments.values()))
+            if now - received_at < FRAGMENT_TTL_SECS:
+                break
+            self._fragments.popitem(last=False)
+        if message_id not in self._fragments:
+            self._fragments[message_id] = (now, [None] * int(count))
+        _, fragments = self._fragments[message_id]
+        fragments[int(index)] = piece
+        if all(fragment is not None for fragment in fragments):
+            del self._fragments[message_id]
+            self._dispatch(channel, "".join(fragments))
+
+
+@lru_cache(maxsize=1)
+def get_pubsub() -> PubSub:
+    settings = get_settings()
+    if settings.streaming.pubsub == "postgres":
+        dsn = settings.sqlalchemy_database_uri.set(drivername="postgresql")
+        return PostgresPubSub(dsn.render_as_string(hide_password=False))
+    return InMemoryPubSub()
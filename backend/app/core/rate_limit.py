@@ -0,0 +1,164 @@
+# Admission control for chat turns: token buckets per user and per model_code.
+#
+# Every scope has two buckets, requests per minute and model tokens per minute.
+# A turn is admitted only when all of its buckets can pay at once: one request,
+# and a token balance covering at least the estimated prompt. The real cost is
+# only known when the answer is saved, so total_tokens of the saved usage is
+# charged afterwards and may drive a bucket into debt, which later turns wait out.
+# Rejected turns get a 429 with Retry-After set to when the buckets will allow it.
+#
+# Buckets live behind RateLimiterBackend. InMemoryRateLimiter keeps them per
+# worker, so with N workers the effective limits are up to N times higher until
+# a shared backend is plugged into get_rate_limiter.
+
+import math
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Sequence
+from dataclasses import dataclass
+from functools import lru_cache
+
+from fastapi import HTTPException, status
+from prometheus_client import Counter
+
+from app.api import api_messages
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+
+RATE_LIMITED = Counter(
+    "chat_rate_limited_total",
+    "Chat turns rejected by the rate limiter by exhausted limit",
+    ["limit"],
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Quota:
+    key: str
+    limit: int
+    period_secs: float = 60.0
+
+    @property
+    def refill_per_sec(self) -> float:
+        return self.limit / self.period_secs
+
+
+@dataclass(frozen=True, slots=True)
+class Charge:
+    quota: Quota
+    cost: float
+    # balance the bucket must hold before paying, at least the cost
+    required: float = 0.0
+
+
+class RateLimiterBackend(ABC):
+    @abstractmethod
+    async def acquire(self, charges: Sequence[Charge]) -> list[float]:
+        # All or nothing: every charge is paid when none has to wait, otherwise
+        # nothing is paid. Returns the seconds each charge has to wait.
+        ...
+
+    @abstractmethod
+    async def charge(self, quota: Quota, cost: float) -> None:
+        # Pays unconditionally, the balance may become negative.
+        ...
+
+
+class InMemoryRateLimiter(RateLimiterBackend):
+    def __init__(self, max_keys: int = 100_000) -> None:
+        # a bucket that is not stored is full, so entries expire once refilled
+        self._buckets = TTLCache(max_size=max_keys, ttl=24 * 3600)
+
+    def _level(self, quota: Quota, now: float) -> float:
+        bucket = self._buckets.get(quota.key)
+        if bucket is None:
+            return float(quota.limit)
+        level, updated_at = bucket
+        return min(quota.limit, level + (now - updated_at) * quota.refill_per_sec)
+
+    def _store(self, quota: Quota, level: float, now: float) -> None:
+        refill_secs = (quota.limit - level) / quota.refill_per_sec
+        if refill_secs <= 0:
+            self._buckets.pop(quota.key)
+            return
+        self._buckets.set(quota.key, (level, now), ttl=refill_secs)
+
+    async def acquire(self, charges: Sequence[Charge]) -> list[float]:
+        now = time.monotonic()
+        waits = []
+        for item in charges:
+            # a bucket never holds more than its limit
+            needed = min(max(item.cost, item.required), item.quota.limit)
+            missing = needed - self._level(item.quota, now)
+            waits.append(max(missing, 0) / item.quota.refill_per_sec)
+        if any(waits):
+            return waits
+        for item in charges:
+            level = self._level(item.quota, now)
+            self._store(item.quota, level - item.cost, now)
+        return waits
+
+    async def charge(self, quota: Quota, cost: float) -> None:
+        now = time.monotonic()
+        self._store(quota, self._level(quota, now) - cost, now)
+
+
+class ChatRateLimiter:
+    def __init__(self, backend: RateLimiterBackend) -> None:
+        self.backend = backend
+
+    def _quotas(self, user_id: str, model_code: str | None) -> list[tuple[str, Quota]]:
+        config = get_settings().rate_limit
+        model_code = model_code or "default"
+        quotas = [
+            ("user_requests", f"user:{user_id}:requests", config.user_requests_per_min),
+            ("user_tokens", f"user:{user_id}:tokens", config.user_tokens_per_min),
+            (
+                "model_requests",
+                f"model:{model_code}:requests",
+                config.model_requests_per_min,
+            ),
+            ("model_tokens", f"model:{model_code}:tokens", config.model_tokens_per_min),
+        ]
+        # a limit of 0 disables that bucket
+        return [(name, Quota(key, limit)) for name, key, limit in quotas if limit > 0]
+
+    async def admit(
+        self, user_id: str, model_code: str | None, estimated_tokens: int
+    ) -> None:
+        if not get_settings().rate_limit.enabled:
+            return
+        quotas = self._quotas(user_id, model_code)
+        charges = [
+            (
+                Charge(quota, cost=1)
+                if name.endswith("_requests")
+                else Charge(quota, cost=0, required=estimated_tokens)
+            )
+            for name, quota in quotas
+        ]
+        waits = await self.backend.acquire(charges)
+        if not any(waits):
+            return
+        for (name, _), wait_secs in zip(quotas, waits):
+            if wait_secs > 0:
+                RATE_LIMITED.labels(name).inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=api_messages.CHAT_RATE_LIMITED,
+            headers={"Retry-After": str(math.ceil(max(waits)))},
+        )
+
+    async def record_usage(
+        self, user_id: str, model_code: str | None, total_tokens: int | None
+    ) -> None:
+        if not get_settings().rate_limit.enabled or not total_tokens:
+            return
+        for name, quota in self._quotas(user_id, model_code):
+            if name.endswith("_tokens"):
+                await self.backend.charge(quota, total_tokens)
+
+
+@lru_cache(maxsize=1)
+def get_rate_limiter() -> ChatRateLimiter:
+    return ChatRateLimiter(InMemoryRateLimiter())
@@ -1,12 +1,24 @@
 import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
 
 import jwt
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from cryptography.hazmat.primitives.serialization import (
+    load_pem_private_key,
+    load_pem_public_key,
+)
 from fastapi import HTTPException, status
+from jwt.algorithms import OKPAlgorithm, RSAAlgorithm
 from pydantic import BaseModel
 
+from app.core.cache import TTLCache
 from app.core.config import get_settings
 
 JWT_ALGORITHM = "HS256"
+ASYMMETRIC_ALGORITHMS = ("RS256", "EdDSA")
+REQUIRED_CLAIMS = ["iss", "sub", "exp", "iat"]
 
 
 # Payload follows RFC 7519
@@ -23,27 +35,142 @@ class JWTToken(BaseModel):
     access_token: str
 
 
+@dataclass(frozen=True)
+class JWTKey:
+    kid: str | None
+    algorithm: str
+    verifying_key: Any
+    signing_key: Any | None = None
+
+    def to_jwk(self) -> dict[str, Any]:
+        if isinstance(self.verifying_key, rsa.RSAPublicKey):
+            jwk = RSAAlgorithm.to_jwk(self.verifying_key, as_dict=True)
+        else:
+            jwk = OKPAlgorithm.to_jwk(self.verifying_key, as_dict=True)
+        return {**jwk, "kid": self.kid, "alg": self.algorithm, "use": "sig"}
+
+
+class JWTKeyRing:
+    # Parsed signing and verification keys, keyed by "kid".
+    #
+    # The HS256 secret is registered under kid None, which is what tokens issued
+    # without a "kid" header (all tokens before asymmetric signing) resolve to.
+    # After moving to RS256 / EdDSA it is only kept while jwt_accept_legacy_hs256
+    # is on, so the shared secret can be retired once its tokens have expired.
+    # Rotation: sign with a new jwt_private_key / jwt_signing_key_id and keep the
+    # previous public key in jwt_public_keys until its tokens have expired.
+
+    def __init__(self, signing_key: JWTKey, keys: list[JWTKey], issuer: str) -> None:
+        self.signing_key = signing_key
+        self.issuer = issuer
+        self._keys = {key.kid: key for key in keys}
+
+    def get(self, kid: str | None) -> JWTKey | None:
+        return self._keys.get(kid)
+
+    def jwks(self) -> dict[str, Any]:
+        # only asymmetric keys can be published
+        return {
+            "keys": [
+                key.to_jwk()
+                for key in self._keys.values()
+                if key.algorithm in ASYMMETRIC_ALGORITHMS
+            ]
+        }
+
+
+def _algorithm_for(key: Any) -> str:
+    if isinstance(key, (rsa.RSAPrivateKey, rsa.RSAPublicKey)):
+        return "RS256"
+    if isinstance(key, (ed25519.Ed25519PrivateKey, ed25519.Ed25519PublicKey)):
+        return "EdDSA"
+    raise ValueError(f"Unsupported JWT key type {type(key).__name__}")
+
+
+@lru_cache(maxsize=1)
+def get_key_ring() -> JWTKeyRing:
+    security = get_settings().security
+    secret = security.jwt_secret_key.get_secret_value()
+    hs256_key = JWTKey(
+        kid=None, algorithm="HS256", verifying_key=secret, signing_key=secret
+    )
+    keys = []
+    if security.jwt_algorithm == JWT_ALGORITHM or security.jwt_accept_legacy_hs256:
+        keys.append(hs256_key)
+
+    for kid, public_pem in security.jwt_public_keys.items():
+        public_key = load_pem_public_key(public_pem.encode())
+        keys.append(JWTKey(kid, _algorithm_for(public_key), public_key))
+
+    signing_key = hs256_key
+    if security.jwt_algorithm in ASYMMETRIC_ALGORITHMS:
+        if security.jwt_private_key is None:
+            raise ValueError(f"{security.jwt_algorithm} requires jwt_private_key")
+        private_key = load_pem_private_key(
+            security.jwt_private_key.get_secret_value().encode(), password=None
+        )
+        if _algorithm_for(private_key) != security.jwt_algorithm:
+            raise ValueError(f"jwt_private_key is not a {security.jwt_algorithm} key")
+        signing_key = JWTKey(
+            kid=security.jwt_signing_key_id,
+            algorithm=security.jwt_algorithm,
+            verifying_key=private_key.public_key(),
+            signing_key=private_key,
+        )
+        keys.append(signing_key)
+    elif security.jwt_algorithm != JWT_ALGORITHM:
+        raise ValueError(f"Unsupported JWT algorithm {security.jwt_algorithm}")
+
+    return JWTKeyRing(signing_key, keys, issuer=security.jwt_issuer)
+
+
 def create_jwt_token(user_id: str) -> JWTToken:
+    key_ring = get_key_ring()
     iat = int(time.time())
     exp = iat + get_settings().security.jwt_access_token_expire_secs
 
     token_payload = JWTTokenPayload(
-        iss=get_settings().security.jwt_issuer,
+        iss=key_ring.issuer,
         sub=user_id,
         exp=exp,
         iat=iat,
     )
 
+    signing_key = key_ring.signing_key
     access_token = jwt.encode(
         token_payload.model_dump(),
-        key=get_settings().security.jwt_secret_key.get_secret_value(),
-        algorithm=JWT_ALGORITHM,
+        key=signing_key.signing_key,
+        algorithm=signing_key.algorithm,
+        headers={"kid": signing_key.kid} if signing_key.kid else None,
     )
 
     return JWTToken(payload=token_payload, access_token=access_token)
 
 
+@lru_cache(maxsize=1)
+def get_token_cache() -> TTLCache:
+    security = get_settings().security
+    return TTLCache(
+        max_size=security.token_cache_max_size,
+        ttl=security.jwt_access_token_expire_secs,
+    )
+
+
+def _invalid_token(reason: Any) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=f"Token invalid: {reason}",
+    )
+
+
 def verify_jwt_token(token: str) -> JWTTokenPayload:
+    # Verified payloads are cached for the remaining lifetime of the token, so a
+    # client reusing its token skips signature verification and parsing.
+    token_cache = get_token_cache()
+    token_payload = token_cache.get(token)
+    if token_payload is not None:
+        return token_payload
+
     # Pay attention to verify_signature passed explicite, even if it is the default.
     # Verification is based on expected payload fields like "exp", "iat" etc.
     # so if you rename for example "exp" to "my_custom_exp", this is gonna break,
@@ -51,19 +178,29 @@ def verify_jwt_token(token: str) -> JWTTokenPayload:
     # be major security risk - not validating tokens at all.
     # If unsure, jump into jwt.decode code, make sure tests are passing
     # https://pyjwt.readthedocs.io/en/stable/usage.html#encoding-decoding-tokens-with-hs256
+    #
+    # Only the algorithm of the key selected by "kid" is accepted, which rules out
+    # algorithm confusion (e.g. an HS256 token signed with a published RSA key).
 
+    key_ring = get_key_ring()
     try:
+        key = key_ring.get(jwt.get_unverified_header(token).get("kid"))
+        if key is None:
+            raise _invalid_token("unknown signing key")
         raw_payload = jwt.decode(
             token,
-            get_settings().security.jwt_secret_key.get_secret_value(),
-            algorithms=[JWT_ALGORITHM],
-            options={"verify_signature": True},
-            issuer=get_settings().security.jwt_issuer,
+            key.verifying_key,
+            algorithms=[key.algorithm],
+            options={"verify_signature": True, "require": REQUIRED_CLAIMS},
+            issuer=key_ring.issuer,
         )
     except jwt.InvalidTokenError as e:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail=f"Token invalid: {e}",
-        )
+        raise _invalid_token(e)
 
-    return JWTTokenPayload(**raw_payload)
+    # Fast path: jwt.decode has already required and validated every claim,
+    # so the payload model is built without running validation again.
+    token_payload = JWTTokenPayload.model_construct(
+        **{claim: raw_payload[claim] for claim in REQUIRED_CLAIMS}
+    )
+    token_cache.set(token, token_payload, ttl=token_payload.exp - time.time())
+    return token_payload
@@ -1,7 +1,28 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import bcrypt
+from fastapi import HTTPException, status
+from prometheus_client import Counter, Gauge, Histogram
 
+from app.api import api_messages
 from app.core.config import get_settings
 
+PASSWORD_HASH_IN_FLIGHT = Gauge(
+    "password_hash_in_flight",
+    "bcrypt operations running or waiting for a worker",
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total",
+    "bcrypt operations rejected because the worker pool queue was full",
+)
+PASSWORD_HASH_QUEUE_WAIT = Histogram(
+    "password_hash_queue_wait_seconds",
+    "Time a bcrypt operation waited for a free worker",
+)
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(
@@ -17,3 +38,63 @@ def get_password_hash(password: str) -> str:
 
 
 DUMMY_PASSWORD = get_password_hash("")
+
+
+class PasswordHasherPool:
+    # bcrypt takes ~250ms of CPU at 12 rounds and releases the GIL, so it runs on a
+    # small thread pool instead of the event loop. At most max_pending operations
+    # may be running or queued; beyond that callers get a 503 with Retry-After
+    # rather than piling up behind a login burst.
+
+    def __init__(self, max_workers: int, max_pending: int) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="bcrypt"
+        )
+        self._max_pending = max_pending
+        self._pending = 0
+
+    async def run(self, fn, *args):
+        if self._pending >= self._max_pending:
+            PASSWORD_HASH_REJECTED.inc()
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=api_messages.PASSWORD_HASHER_BUSY,
+                headers={"Retry-After": "1"},
+            )
+        self._pending += 1
+        PASSWORD_HASH_IN_FLIGHT.inc()
+        submitted_at = time.perf_counter()
+
+        def timed_call():
+            PASSWORD_HASH_QUEUE_WAIT.observe(time.perf_counter() - submitted_at)
+            return fn(*args)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, timed_call
+            )
+        finally:
+            self._pending -= 1
+            PASSWORD_HASH_IN_FLIGHT.dec()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+@lru_cache(maxsize=1)
+def get_password_hasher_pool() -> PasswordHasherPool:
+    security = get_settings().security
+    return PasswordHasherPool(
+        max_workers=security.password_hash_workers,
+        max_pending=security.password_hash_max_pending,
+    )
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await get_password_hasher_pool().run(
+        verify_password, plain_password, hashed_password
+    )
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await get_password_hasher_pool().run(get_password_hash, password)
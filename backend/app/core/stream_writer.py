@@ -0,0 +1,126 @@
+# Coalescing of streamed model text into fewer, larger frames.
+#
+# Models emit one chunk per token, and writing each one as its own frame means
+# thousands of tiny socket writes and event loop wakeups per answer. coalesce_text
+# merges consecutive text chunks and releases them when the first of these is
+# reached:
+#
+# - the buffered text reaches max_bytes
+# - the oldest buffered chunk has waited max_latency_secs
+# - a non-text item arrives (e.g. a tool call): text is flushed before it so
+#   frames keep their order around tool call boundaries
+# - the source is exhausted
+#
+# A reader task drains the source into a buffer and only wakes the consumer for
+# the first chunk of a frame or when a flush is due, so the cost per token is an
+# append, and a frame costs one wakeup and one timer.
+
+import asyncio
+from collections.abc import AsyncIterable, AsyncIterator
+from dataclasses import dataclass
+from typing import Any
+
+from app.core.config import get_settings
+
+
+@dataclass(frozen=True, slots=True)
+class FlushPolicy:
+    max_bytes: int
+    max_latency_secs: float
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_latency_secs > 0 and self.max_bytes > 1
+
+
+def get_flush_policy() -> FlushPolicy:
+    streaming = get_settings().streaming
+    return FlushPolicy(
+        max_bytes=streaming.flush_max_bytes,
+        max_latency_secs=streaming.flush_max_latency_secs,
+    )
+
+
+class _Buffer:
+    def __init__(self, policy: FlushPolicy) -> None:
+        self.policy = policy
+        self.items: list[Any] = []
+        self.text_bytes = 0
+        self.first_text_at = 0.0
+        self.exhausted = False
+        self.has_items = asyncio.Event()
+        self.flush_due = asyncio.Event()
+
+    async def read(self, source: AsyncIterable[Any]) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            async for item in source:
+                if isinstance(item, str):
+                    if not item:
+                        continue
+                    if self.text_bytes == 0:
+                        self.first_text_at = loop.time()
+                    self.text_bytes += len(item.encode("utf-8"))
+                    if self.text_bytes >= self.policy.max_bytes:
+                        self.flush_due.set()
+                else:
+                    self.flush_due.set()
+                self.items.append(item)
+                self.has_items.set()
+        finally:
+            self.exhausted = True
+            self.flush_due.set()
+            self.has_items.set()
+
+    def drain(self) -> list[Any]:
+        # consecutive text chunks become one, boundaries keep their position
+        frames: list[Any] = []
+        text: list[str] = []
+        for item in self.items:
+            if isinstance(item, str):
+                text.append(item)
+                continue
+            if text:
+                frames.append("".join(text))
+                text = []
+            frames.append(item)
+        if text:
+            frames.append("".join(text))
+        self.items = []
+        self.text_bytes = 0
+        self.has_items.clear()
+        if not self.exhausted:
+            self.flush_due.clear()
+        return frames
+
+
+async def coalesce_text(
+    items: AsyncIterable[Any], policy: FlushPolicy | None = None
+) -> AsyncIterator[Any]:
+    # str items are merged, every other item is passed through as a boundary.
+    policy = policy or get_flush_policy()
+    if not policy.enabled:
+        async for item in items:
+            yield item
+        return
+
+    buffer = _Buffer(policy)
+    reader = asyncio.create_task(buffer.read(items))
+    try:
+        while True:
+            await buffer.has_items.wait()
+            if not buffer.flush_due.is_set():
+                deadline = buffer.first_text_at + policy.max_latency_secs
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        await buffer.flush_due.wait()
+                except TimeoutError:
+                    pass
+            for frame in buffer.drain():
+                yield frame
+            if buffer.exhausted and not buffer.items:
+                break
+        # re-raises an error of the source
+        await reader
+    finally:
+        reader.cancel()
@@ -1,31 +1,54 @@
-from datetime import datetime, timezone
-from pydantic import BaseModel
-from pydantic_ai import Agent
-from pydantic_ai.models.openai import OpenAIModel
-from pydantic_ai.providers.openai import OpenAIProvider
+from langchain_core.messages import (
+    BaseMessage,
+    RemoveMessage,
+    SystemMessage,
+    trim_messages,
+)
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END, START
-from langchain_core.messages import AIMessage
-from app.core.config import get_settings
-
-# from .tools import tools
+from pydantic import BaseModel
+from app.chat.context import estimate_tokens
+from app.chat.model_config import get_context_limits
+from app.core.llm import get_model_registry
+from app.core.metrics import current_turn_timer, log_event, timed_node
+
+from .frontend_tools import (
+    frontend_tool_names,
+    frontend_tool_specs,
+    frontend_tools,
+    pending_frontend_calls,
+)
+from .tool_node import create_tool_node
+from .tools import tools
 from .state import AgentState
 
-model = OpenAIModel(
-    "gpt-4o-mini-2024-07-18",
-    provider=OpenAIProvider(
-        api_key=get_settings().appconfig.openai_api_key.get_secret_value()
-    ),
-)
-pydantic_agent = Agent(model=model)
+MODEL_CODE = "GPT_4O_MINI"
+# flat estimate for an image part, whatever its size
+IMAGE_PART_TOKENS = 1_000
+
+chat_model = get_model_registry().get_chat_model("openai", "gpt-4o-mini-2024-07-18")
 
 
-def should_continue(state):
+def should_continue(state, config: RunnableConfig):
     messages = state["messages"]
     last_message = messages[-1]
     if not last_message.tool_calls:
         return END
-    else:
+    frontend = frontend_tool_names(config)
+    if any(call["name"] not in frontend for call in last_message.tool_calls):
         return "tools"
+    return after_tools(state, config)
+
+
+def after_tools(state, config: RunnableConfig):
+    # Frontend calls are run by the client, see app/langgraph/frontend_tools.py.
+    # Without a thread there is no checkpoint to resume, so the run ends and the
+    # client sends the results with the history of its next request.
+    if pending_frontend_calls(state, config):
+        if config["configurable"].get("thread_id"):
+            return "frontend_tools"
+        return END
+    return "agent"
 
 
 class AnyArgsSchema(BaseModel):
@@ -35,42 +58,102 @@ class AnyArgsSchema(BaseModel):
         extra = "allow"
 
 
-@pydantic_agent.tool_plain
-def get_stock_price(stock: str):
+def count_tokens(messages: list[BaseMessage]) -> int:
+    tokens = 0
+    for message in messages:
+        if isinstance(message.content, str):
+            tokens += estimate_tokens(message.content)
+            continue
+        for part in message.content:
+            if isinstance(part, dict) and part.get("type") == "text":
+                tokens += estimate_tokens(part["text"])
+            else:
+                tokens += IMAGE_PART_TOKENS
+    return tokens
+
+
+async def trim(state: AgentState):
+    # Keeps the newest messages that fit the token budget of the model, starting
+    # on a user message so no tool result loses its call. Dropped messages are
+    # removed from the state rather than hidden from the model only. As in
+    # load_context_window, the newest user message is always kept, even alone
+    # over the budget.
+    messages = state["messages"]
+    _, max_tokens = get_context_limits(MODEL_CODE)
+    kept = trim_messages(
+        messages,
+        max_tokens=max_tokens,
+        token_counter=count_tokens,
+        strategy="last",
+        start_on="human",
+        include_system=True,
+    )
+    newest_human = next(
+        (i for i in reversed(range(len(messages))) if messages[i].type == "human"),
+        None,
+    )
+    if newest_human is not None and messages[newest_human].id not in {
+        message.id for message in kept
+    }:
+        system = messages[:1] if messages[0].type == "system" else []
+        kept = system + messages[newest_human:]
+    if len(kept) == len(messages):
+        return {}
+    kept_ids = {message.id for message in kept}
     return {
-        "AAPL": {
-            "symbol": "AAPL",
-            "company_name": "Apple Inc.",
-            "current_price": 173.50,
-            "change": 2.35,
-            "change_percent": 1.37,
-            "volume": 52436789,
-            "market_cap": "2.73T",
-            "pe_ratio": 28.5,
-            "fifty_two_week_high": 198.23,
-            "fifty_two_week_low": 124.17,
-            "timestamp": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
-        }
+        "messages": [
+            RemoveMessage(id=message.id)
+            for message in messages
+            if message.id not in kept_ids
+        ]
     }
 
 
-async def agent(state: AgentState):
-    query = state["messages"][-1].content
-    q = " ".join(q["text"] for q in query)
-    print(f"Query: {q}")
-    result = await pydantic_agent.run(q)
+async def agent(state: AgentState, config: RunnableConfig):
+    # The whole (trimmed) conversation goes to the model. Under
+    # graph.astream(stream_mode="messages") its tokens are streamed as
+    # AIMessageChunks while this call runs.
+    messages = state["messages"]
+    system = config["configurable"].get("system")
+    if system:
+        messages = [SystemMessage(content=system), *messages]
+    model = chat_model.bind_tools([*tools, *frontend_tool_specs(config)])
+    response = await model.ainvoke(messages, config)
+    usage = response.usage_metadata or {}
+    timer = current_turn_timer.get()
+    if timer is not None:
+        timer.response_tokens = (timer.response_tokens or 0) + usage.get(
+            "output_tokens", 0
+        )
+    log_event(
+        "graph_agent_run",
+        messages=len(messages),
+        request_tokens=usage.get("input_tokens"),
+        response_tokens=usage.get("output_tokens"),
+        tool_calls=len(response.tool_calls),
+    )
     # We return a list, because this will get added to the existing list
-    return {"messages": [AIMessage(content=result.data)]}
+    return {"messages": [response]}
 
 
 def create_workflow():
     # Define a new graph
     workflow = StateGraph(AgentState)
 
-    workflow.add_node("agent", agent)
-
-    workflow.add_edge(START, "agent")
-    workflow.add_edge("agent", END)
+    workflow.add_node("trim", timed_node("trim", trim))
+    workflow.add_node("agent", timed_node("agent", agent))
+    workflow.add_node("tools", timed_node("tools", create_tool_node(tools)))
+    workflow.add_node("frontend_tools", frontend_tools)
+
+    workflow.add_edge(START, "trim")
+    workflow.add_edge("trim", "agent")
+    workflow.add_conditional_edges(
+        "agent", should_continue, ["tools", "frontend_tools", "agent", END]
+    )
+    workflow.add_conditional_edges(
+        "tools", after_tools, ["frontend_tools", "agent", END]
+    )
+    workflow.add_edge("frontend_tools", "agent")
     return workflow.compile()
 
 
@@ -0,0 +1,98 @@
+# Checkpointer of the langgraph route, see add_langgraph_route.
+#
+# When a request names a thread_id, the graph state of that thread is saved
+# after every step. The client then sends only its new message, and the turn
+# resumes from the latest checkpoint.
+#
+# "postgres" stores the checkpoints in the app database with
+# langgraph-checkpoint-postgres. That package uses psycopg 3, so it gets a small
+# pool of its own next to the SQLAlchemy (asyncpg) one. "memory" keeps the
+# checkpoints in this process and is meant for tests and single-worker runs.
+#
+# The checkpoint tables are created or migrated once per deploy, before the
+# workers start:
+#
+#   python -m app.langgraph.checkpointer
+
+import asyncio
+from functools import lru_cache
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+
+from app.core.config import get_settings
+from app.core.logger import get_logger
+
+_logger = get_logger(__name__)
+
+
+class CheckpointerProvider:
+    def __init__(self) -> None:
+        self.config = get_settings().langgraph
+        self._checkpointer: BaseCheckpointSaver | None = None
+        self._pool = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> BaseCheckpointSaver:
+        # created on first use, the pool is opened by the first thread-mode turn
+        if self._checkpointer is None:
+            async with self._lock:
+                if self._checkpointer is None:
+                    self._checkpointer = await self._create()
+        return self._checkpointer
+
+    async def _create(self) -> BaseCheckpointSaver:
+        if self.config.checkpointer == "memory":
+            return MemorySaver()
+
+        from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
+        from psycopg.rows import dict_row
+        from psycopg_pool import AsyncConnectionPool
+
+        dsn = get_settings().sqlalchemy_database_uri.set(drivername="postgresql")
+        pool = AsyncConnectionPool(
+            dsn.render_as_string(hide_password=False),
+            max_size=self.config.checkpoint_pool_size,
+            open=False,
+            # what AsyncPostgresSaver expects of its connections
+            kwargs={
+                "autocommit": True,
+                "prepare_threshold": 0,
+                "row_factory": dict_row,
+            },
+        )
+        await pool.open()
+        checkpointer = AsyncPostgresSaver(pool)
+        if self.config.checkpoint_setup:
+            await checkpointer.setup()
+        self._pool = pool
+        _logger.info("langgraph checkpoints stored in postgres")
+        return checkpointer
+
+    async def setup(self) -> None:
+        checkpointer = await self.get()
+        if not isinstance(checkpointer, MemorySaver):
+            await checkpointer.setup()
+
+    async def aclose(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+        self._checkpointer = None
+
+
+@lru_cache(maxsize=1)
+def get_checkpointer_provider() -> CheckpointerProvider:
+    return CheckpointerProvider()
+
+
+async def setup_checkpoints() -> None:
+    provider = CheckpointerProvider()
+    try:
+        await provider.setup()
+    finally:
+        await provider.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(setup_checkpoints())
@@ -0,0 +1,82 @@
+# Frontend tools of the langgraph route.
+#
+# The client sends the tools it runs itself in ChatRequest.tools, they reach the
+# graph in configurable.frontend_tools and are offered to the model next to the
+# backend tools. When the model calls one of them:
+#
+# - with a thread_id, the frontend_tools node interrupts the run. The state is
+#   checkpointed, the stream ends after the tool call, and the request carrying
+#   the tool results resumes the run with Command(resume=...). Nothing waits in
+#   the server while the browser runs the tool.
+# - without one, the run ends and the client sends the results with the rest of
+#   the history in its next request.
+
+from langchain_core.messages import AIMessage, ToolCall, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langgraph.types import interrupt
+
+from .state import AgentState
+
+
+def frontend_tool_names(config: RunnableConfig) -> set[str]:
+    tools = config["configurable"].get("frontend_tools") or []
+    return {tool.name for tool in tools}
+
+
+def frontend_tool_specs(config: RunnableConfig) -> list[dict]:
+    # in the OpenAI function format accepted by bind_tools
+    return [
+        {
+            "type": "function",
+            "function": {
+                "name": tool.name,
+                "description": tool.description or "",
+                "parameters": tool.parameters,
+            },
+        }
+        for tool in config["configurable"].get("frontend_tools") or []
+    ]
+
+
+def pending_frontend_calls(state: AgentState, config: RunnableConfig) -> list[ToolCall]:
+    # frontend calls of the last model message that have no result yet
+    names = frontend_tool_names(config)
+    if not names:
+        return []
+    answered = set()
+    for message in reversed(state["messages"]):
+        if isinstance(message, ToolMessage):
+            answered.add(message.tool_call_id)
+        elif isinstance(message, AIMessage):
+            return [
+                call
+                for call in message.tool_calls
+                if call["name"] in names and call["id"] not in answered
+            ]
+    return []
+
+
+def unanswered_tool_message(call: ToolCall) -> ToolMessage:
+    return ToolMessage(
+        content="Error: the client sent no result for this call",
+        name=call["name"],
+        tool_call_id=call["id"],
+        status="error",
+    )
+
+
+async def frontend_tools(state: AgentState, config: RunnableConfig):
+    calls = pending_frontend_calls(state, config)
+    # raises on the first run, returns the {tool_call_id: result} of the resume
+    # request when the run is resumed
+    results = interrupt({"tool_calls": calls})
+    messages = []
+    for call in calls:
+        if call["id"] in results:
+            message = ToolMessage(
+                content=results[call["id"]], name=call["name"], tool_call_id=call["id"]
+            )
+        else:
+            message = unanswered_tool_message(call)
+        messages.append(message)
+    return {"messages": messages}
@@ -0,0 +1,146 @@
+# Tools node of the langgraph agent.
+#
+# All tool calls of one model step run concurrently. Each call has a timeout,
+# and its ToolMessage is written to the "custom" stream as soon as it finishes,
+# so the route can report a result while slower tools are still running. The node
+# still returns all messages, in the order of the calls, to update the state.
+#
+# Results are cached by (tool, arguments) for a short TTL, and identical calls
+# that are in flight at the same time share one run. Failed and timed out calls
+# are not cached; they are reported to the model as error tool messages.
+
+import asyncio
+import json
+import time
+from typing import Any
+
+from langchain_core.messages import AIMessage, ToolCall, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool
+from langgraph.config import get_stream_writer
+from langgraph.prebuilt.tool_node import msg_content_output
+
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.core.metrics import GRAPH_TOOL_SECONDS
+
+from .frontend_tools import frontend_tool_names
+from .state import AgentState
+
+
+class ToolTimeoutError(Exception):
+    pass
+
+
+class ParallelToolExecutor:
+    def __init__(self, tools: list[BaseTool]) -> None:
+        self.config = get_settings().langgraph
+        self.tools = {tool.name: tool for tool in tools}
+        max_ttl = max(
+            [self.config.tool_cache_ttl_secs, *self.config.tool_cache_ttls.values()]
+        )
+        self._cache = TTLCache(max_size=self.config.tool_cache_max_size, ttl=max_ttl)
+        self._in_flight: dict[tuple[str, str], asyncio.Future] = {}
+
+    def timeout_for(self, name: str) -> float:
+        return self.config.tool_timeouts.get(name, self.config.tool_timeout_secs)
+
+    def cache_ttl_for(self, name: str) -> float:
+        return self.config.tool_cache_ttls.get(name, self.config.tool_cache_ttl_secs)
+
+    async def run(self, call: ToolCall, config: RunnableConfig) -> ToolMessage:
+        name = call["name"]
+        tool = self.tools.get(name)
+        if tool is None:
+            return self._error(call, f"{name} is not a valid tool")
+
+        key = (name, json.dumps(call["args"], sort_keys=True, default=str))
+        content = self._cache.get(key)
+        if content is not None:
+            GRAPH_TOOL_SECONDS.labels(name, "cached").observe(0)
+            return ToolMessage(content=content, name=name, tool_call_id=call["id"])
+
+        # an identical call is running: wait for it, shielded so that the
+        # cancellation of this step does not cancel the other one
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            try:
+                content = await asyncio.shield(in_flight)
+            except asyncio.CancelledError:
+                if not in_flight.cancelled():
+                    raise
+                # the step running it was cancelled, run the call again
+                return await self.run(call, config)
+            except Exception as e:
+                return self._error(call, e)
+            return ToolMessage(content=content, name=name, tool_call_id=call["id"])
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        started_at = time.perf_counter()
+        status = "ok"
+        try:
+            content = await self._invoke(tool, call["args"], config)
+            self._cache.set(key, content, ttl=self.cache_ttl_for(name))
+            future.set_result(content)
+            return ToolMessage(content=content, name=name, tool_call_id=call["id"])
+        except ToolTimeoutError as e:
+            status = "timeout"
+            future.set_exception(e)
+            return self._error(call, e)
+        except Exception as e:
+            status = "error"
+            future.set_exception(e)
+            return self._error(call, e)
+        finally:
+            if not future.done():
+                future.cancel()
+            # nobody else may be waiting, keep asyncio from logging the exception
+            if not future.cancelled():
+                future.exception()
+            self._in_flight.pop(key, None)
+            GRAPH_TOOL_SECONDS.labels(name, status).observe(
+                time.perf_counter() - started_at
+            )
+
+    async def _invoke(
+        self, tool: BaseTool, args: dict[str, Any], config: RunnableConfig
+    ) -> str | list:
+        timeout = self.timeout_for(tool.name)
+        try:
+            # sync tools run in the default executor; after a timeout their
+            # thread finishes on its own, but the step does not wait for it
+            output = await asyncio.wait_for(tool.ainvoke(args, config), timeout)
+        except asyncio.TimeoutError:
+            raise ToolTimeoutError(f"{tool.name} timed out after {timeout:g}s")
+        return msg_content_output(output)
+
+    def _error(self, call: ToolCall, error: Exception | str) -> ToolMessage:
+        return ToolMessage(
+            content=f"Error: {error}\n Please fix your mistakes.",
+            name=call["name"],
+            tool_call_id=call["id"],
+            status="error",
+        )
+
+
+def create_tool_node(tools: list[BaseTool]):
+    executor = ParallelToolExecutor(tools)
+
+    async def tool_node(state: AgentState, config: RunnableConfig):
+        message = state["messages"][-1]
+        assert isinstance(message, AIMessage)
+        # frontend tools are left to the frontend_tools node
+        frontend = frontend_tool_names(config)
+        calls = [call for call in message.tool_calls if call["name"] not in frontend]
+        writer = get_stream_writer()
+
+        async def run(call: ToolCall) -> ToolMessage:
+            result = await executor.run(call, config)
+            writer(result)
+            return result
+
+        results = await asyncio.gather(*(run(call) for call in calls))
+        return {"messages": list(results)}
+
+    return tool_node
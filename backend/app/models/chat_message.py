@@ -1,11 +1,18 @@
 from typing import Any
-from sqlalchemy import BigInteger, Text, ForeignKey, JSON, String
+from sqlalchemy import BigInteger, Text, ForeignKey, Index, JSON, String
 from sqlalchemy.orm import mapped_column, Mapped, relationship
 from app.models.base_model import Base
 
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        # history reads filter by thread and sort/seek by (create_time, id)
+        Index(
+            "ix_chat_messages_thread_id_create_time", "thread_id", "create_time", "id"
+        ),
+    )
+
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     content: Mapped[str] = mapped_column(Text, nullable=False)
     content_type: Mapped[str] = mapped_column(String(16), nullable=False)
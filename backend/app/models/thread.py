@@ -1,6 +1,6 @@
 import uuid
 from typing import Any
-from sqlalchemy import String, ForeignKey, Uuid, JSON
+from sqlalchemy import String, ForeignKey, Index, Uuid, JSON, text
 from sqlalchemy.orm import mapped_column, Mapped, relationship
 
 from app.models.base_model import Base
@@ -10,6 +10,16 @@ from app.models.chat_message import ChatMessage
 
 class Thread(Base):
     __tablename__ = "threads"
+    __table_args__ = (
+        # thread listing filters by user and seeks on (create_time, id)
+        Index("ix_threads_user_id_create_time", "user_id", "create_time", "id"),
+        # partial index over threads still waiting for a generated title
+        Index(
+            "ix_threads_untitled_create_time",
+            "create_time",
+            postgresql_where=text("title IS NULL"),
+        ),
+    )
 
     id: Mapped[str] = mapped_column(
         Uuid(as_uuid=False), primary_key=True, default=lambda _: str(uuid.uuid4())
@@ -19,9 +29,11 @@ class Thread(Base):
     user_id: Mapped[str] = mapped_column(
         ForeignKey("users.id", ondelete="CASCADE"), nullable=False
     )
-    user: Mapped[User] = relationship("User", lazy="selectin")
+    # Never loaded implicitly: a thread can hold tens of thousands of messages,
+    # query ChatMessage directly instead.
+    user: Mapped[User] = relationship("User", lazy="raise")
     chat_messages: Mapped[list["ChatMessage"]] = relationship(
-        "ChatMessage", back_populates="thread", lazy="selectin", uselist=True
+        "ChatMessage", back_populates="thread", lazy="raise", uselist=True
     )
 
     def __repr__(self) -> str:
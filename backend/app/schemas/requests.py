@@ -1,5 +1,5 @@
-from typing import Any, Optional
-from pydantic import BaseModel, EmailStr
+from typing import Any, Literal, Optional
+from pydantic import BaseModel, EmailStr, Field
 
 
 class BaseRequest(BaseModel):
@@ -26,3 +26,12 @@ class ThreadChatMessageRequest(BaseRequest):
     content_type: str = "text"
     is_new_chat: bool = False
     model_code: str = "gpt-4o-mini"
+    # "snapshot" resends the whole answer so far on every line, "delta" sends only
+    # the new text followed by a final "done" line; the SSE transport
+    # ("Accept: text/event-stream") always sends deltas
+    stream_mode: Literal["snapshot", "delta"] = "snapshot"
+    # a retry with the same key attaches to the answer already being generated
+    idempotency_key: Optional[str] = Field(default=None, max_length=128)
+    # set to False when creating a thread to keep its answers out of the response
+    # cache
+    response_cache: Optional[bool] = None
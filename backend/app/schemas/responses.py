@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import Any, Literal, Optional
 from pydantic import BaseModel, ConfigDict, EmailStr
 
 
@@ -45,6 +45,7 @@ class ThreadDetailResponse(BaseResponse):
 
 
 class ChatMessageResponse(BaseResponse):
+    id: Optional[int] = None
     content: str
     content_type: str
     role: str
@@ -55,3 +56,24 @@ class CreateThreadResponse(BaseResponse):
     thread_id: str
     create_time: datetime
     chat_history: list[ChatMessageResponse]
+
+
+class ChatStreamDeltaResponse(BaseResponse):
+    type: Literal["delta"] = "delta"
+    content: str
+
+
+class ChatStreamDoneResponse(BaseResponse):
+    type: Literal["done"] = "done"
+    message: ChatMessageResponse
+    usage: Optional[dict[str, Any]] = None
+
+
+class ChatStreamSnapshotResponse(BaseResponse):
+    type: Literal["snapshot"] = "snapshot"
+    content: str
+
+
+class ChatStreamErrorResponse(BaseResponse):
+    type: Literal["error"] = "error"
+    detail: str
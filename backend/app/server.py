@@ -1,11 +1,39 @@
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI
 from app.api.api_router import api_router
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.chat.titles import get_title_worker
+from app.chat.turns import cancel_running_turns, get_turn_store
 from app.core.config import get_settings
+from app.core.llm import get_model_registry
+from app.core.metrics import metrics_app
+from app.core.security.password import get_password_hasher_pool
+from app.langgraph.checkpointer import get_checkpointer_provider
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    turn_store = get_turn_store()
+    await turn_store.start()
+    title_worker = get_title_worker()
+    if app_settings.titles.mode == "inprocess":
+        title_worker.start()
+    yield
+    await title_worker.stop()
+    await cancel_running_turns()
+    await turn_store.aclose()
+    await get_checkpointer_provider().aclose()
+    await get_model_registry().aclose()
+    get_password_hasher_pool().shutdown()
+
 
 app_settings = get_settings()
 app = FastAPI(
-    docs_url="/docs", title="MeowwChat API", description="Makes you 'meowwwwww'"
+    docs_url="/docs",
+    title="MeowwChat API",
+    description="Makes you 'meowwwwww'",
+    lifespan=lifespan,
 )
 # cors
 app.add_middleware(
@@ -14,8 +42,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 app.include_router(api_router)
+if app_settings.metrics.enabled:
+    token = app_settings.metrics.bearer_token
+    app.mount("/metrics", metrics_app(token.get_secret_value() if token else None))
 
 if __name__ == "__main__":
     import uvicorn
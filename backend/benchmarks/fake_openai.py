@@ -0,0 +1,116 @@
+# Fake OpenAI-compatible chat completions server for benchmarks.
+#
+# Serves POST /v1/chat/completions, streamed (SSE chunks with a final usage
+# chunk, as requested by pydantic-ai) or as one JSON response. The first token
+# is sent after a normally distributed delay, the others at a fixed rate, so
+# load tests measure the app rather than a provider. Point the app at it with
+# LLM__OPENAI_BASE_URL=http://127.0.0.1:8100/v1.
+#
+#   python -m benchmarks.fake_openai --port 8100 --ttft-ms 300 --tokens-per-sec 80
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+
+def create_app(args) -> Starlette:
+    rng = random.Random(0)
+    words = ("lorem", "ipsum", "dolor", "sit", "amet", "consectetur", "elit")
+
+    def first_token_delay() -> float:
+        return max(rng.gauss(args.ttft_ms, args.ttft_jitter_ms), 0) / 1000
+
+    def usage(prompt_tokens: int) -> dict:
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": args.tokens,
+            "total_tokens": prompt_tokens + args.tokens,
+        }
+
+    def chunk(model: str, delta: dict, finish_reason=None, usage=None) -> bytes:
+        payload = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": (
+                []
+                if usage
+                else [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            ),
+            "usage": usage,
+        }
+        return f"data: {json.dumps(payload)}\n\n".encode()
+
+    async def completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake")
+        prompt_tokens = sum(
+            len(str(message.get("content", ""))) // 4 + 1
+            for message in body.get("messages", [])
+        )
+        text = [f"{words[i % len(words)]} " for i in range(args.tokens)]
+
+        if not body.get("stream"):
+            await asyncio.sleep(first_token_delay() + args.tokens / args.tokens_per_sec)
+            return JSONResponse(
+                {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": "".join(text)},
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": usage(prompt_tokens),
+                }
+            )
+
+        async def stream():
+            await asyncio.sleep(first_token_delay())
+            yield chunk(model, {"role": "assistant", "content": ""})
+            for token in text:
+                yield chunk(model, {"content": token})
+                await asyncio.sleep(1 / args.tokens_per_sec)
+            yield chunk(model, {}, finish_reason="stop")
+            yield chunk(model, {}, usage=usage(prompt_tokens))
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    async def health(request: Request):
+        return JSONResponse({"status": "ok"})
+
+    return Starlette(
+        routes=[
+            Route("/v1/chat/completions", completions, methods=["POST"]),
+            Route("/health", health),
+        ]
+    )
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--ttft-ms", type=float, default=300)
+    parser.add_argument("--ttft-jitter-ms", type=float, default=50)
+    parser.add_argument("--tokens", type=int, default=100)
+    parser.add_argument("--tokens-per-sec", type=float, default=80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8100)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(args), host="127.0.0.1", port=args.port, log_level="warning")
@@ -0,0 +1,121 @@
+# CPU benchmark for the request parsing of the langgraph route.
+#
+# Builds assistant-ui payloads of a long conversation (user text and image parts,
+# assistant text and tool calls, tool results), then times, per request:
+#
+# - validate: ChatRequest.model_validate_json of the request body
+# - convert: convert_to_langchain_messages of all messages
+# - grown: converting the same conversation grown by one message with the
+#   MessagePrefixCache of app/add_langgraph_route.py, after the shorter one was
+#   converted, as happens on every turn of a conversation. Conversations over
+#   --cache-max-kb skip the cache (LANGGRAPH__MESSAGE_CACHE_MAX_BYTES)
+#
+#   python -m benchmarks.message_conversion --messages 1000 --image-every 10
+
+import argparse
+import base64
+import json
+import random
+import statistics
+import time
+
+from app.add_langgraph_route import (
+    ChatRequest,
+    MessagePrefixCache,
+    convert_to_langchain_messages,
+)
+
+
+def build_messages(args) -> list[dict]:
+    rng = random.Random(0)
+    image = "data:image/png;base64," + base64.b64encode(
+        rng.randbytes(args.image_kb * 1024)
+    ).decode("ascii")
+    messages = []
+    for i in range(args.messages):
+        turn = i // 3
+        if i % 3 == 0:
+            content = [{"type": "text", "text": f"question {turn} " * 20}]
+            if args.image_every and turn % args.image_every == 0:
+                content.append({"type": "image", "image": image})
+            messages.append({"role": "user", "content": content})
+        elif i % 3 == 1:
+            messages.append(
+                {
+                    "role": "assistant",
+                    "content": [
+                        {"type": "text", "text": f"answer {turn} " * 40},
+                        {
+                            "type": "tool-call",
+                            "toolCallId": f"call_{turn}",
+                            "toolName": "get_stock_price",
+                            "args": {"stock_symbol": "AAPL"},
+                        },
+                    ],
+                }
+            )
+        else:
+            messages.append(
+                {
+                    "role": "tool",
+                    "content": [
+                        {
+                            "type": "tool-result",
+                            "toolCallId": f"call_{turn}",
+                            "toolName": "get_stock_price",
+                            "result": {"symbol": "AAPL", "current_price": 173.5},
+                        }
+                    ],
+                }
+            )
+    return messages
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started_at)
+    return statistics.median(samples) * 1000
+
+
+def main(args) -> None:
+    messages = build_messages(args)
+    body = json.dumps({"system": "", "tools": [], "messages": messages})
+    shorter = ChatRequest.model_validate({"messages": messages[:-1]}).messages
+    request = ChatRequest.model_validate_json(body)
+
+    validate_ms = timed(lambda: ChatRequest.model_validate_json(body), args.repeat)
+    convert_ms = timed(
+        lambda: convert_to_langchain_messages(request.messages), args.repeat
+    )
+
+    def grown():
+        cache = MessagePrefixCache(
+            max_size=16, ttl=60, max_bytes=args.cache_max_kb * 1024
+        )
+        cache.convert(shorter)
+        started_at = time.perf_counter()
+        cache.convert(request.messages)
+        return time.perf_counter() - started_at
+
+    grown_ms = statistics.median(grown() for _ in range(args.repeat)) * 1000
+
+    print(
+        f"{args.messages} messages, {len(body) / 1024:.0f} KiB body, "
+        f"median of {args.repeat} runs"
+    )
+    print(f"{'validate':>10} {validate_ms:8.2f} ms")
+    print(f"{'convert':>10} {convert_ms:8.2f} ms")
+    print(f"{'grown':>10} {grown_ms:8.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--image-every", type=int, default=10)
+    parser.add_argument("--image-kb", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--cache-max-kb", type=int, default=1024)
+    main(parser.parse_args())
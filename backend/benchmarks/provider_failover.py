@@ -0,0 +1,152 @@
+# Fake-provider harness for backend failover and hedged requests.
+#
+# Every backend is a pydantic-ai FunctionModel whose time to first token follows
+# a log-normal distribution (median and p99 are configurable) and that fails at a
+# given rate, so no provider is called. Chat turns are run through
+# routed_run_stream of app/core/llm_router.py, once with a single backend, once
+# with failover only and once with hedging, and the time to first token, failed
+# turns, backend share and extra model calls started by hedging are reported.
+#
+#   python -m benchmarks.provider_failover --turns 400 --concurrency 20 \
+#       --primary 0.4:2.5:0.02 --secondary 0.6:1.2:0.01
+
+import argparse
+import asyncio
+import math
+import random
+import statistics
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from app.core.config import Routing
+from app.core.llm_router import LLMRouter, ModelBackend, routed_run_stream
+
+# z-score of the 99th percentile of a standard normal distribution
+Z_99 = 2.326
+
+
+@dataclass
+class LatencyProfile:
+    median_secs: float
+    p99_secs: float
+    error_rate: float
+
+    @classmethod
+    def parse(cls, value: str) -> "LatencyProfile":
+        median, p99, error_rate = value.split(":")
+        return cls(float(median), float(p99), float(error_rate))
+
+    def sample(self, rng: random.Random) -> float:
+        sigma = math.log(self.p99_secs / self.median_secs) / Z_99
+        return rng.lognormvariate(math.log(self.median_secs), sigma)
+
+
+class ProviderError(Exception):
+    pass
+
+
+def fake_agent(profile: LatencyProfile, tokens: int, seed: int) -> Agent:
+    rng = random.Random(seed)
+
+    async def stream(messages: list[ModelMessage], info: AgentInfo):
+        await asyncio.sleep(profile.sample(rng))
+        if rng.random() < profile.error_rate:
+            raise ProviderError("fake provider error")
+        for i in range(tokens):
+            yield f" tok{i}"
+            await asyncio.sleep(0.001)
+
+    return Agent(FunctionModel(stream_function=stream))
+
+
+async def run_scenario(name: str, backends: list, routing: Routing, args) -> None:
+    router = LLMRouter(routing)
+    calls = Counter()
+
+    def counted(backend: ModelBackend, agent: Agent) -> Agent:
+        run_stream = agent.run_stream
+
+        def wrapper(*a, **kw):
+            calls[backend.name] += 1
+            return run_stream(*a, **kw)
+
+        agent.run_stream = wrapper
+        return agent
+
+    candidates = [(backend, counted(backend, agent)) for backend, agent in backends]
+    first_token_secs: list[float] = []
+    served = Counter()
+    failed = 0
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def turn() -> None:
+        nonlocal failed
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                async with routed_run_stream(
+                    candidates, "hi", message_history=[], router=router
+                ) as result:
+                    first = True
+                    async for _ in result.stream_text():
+                        if first:
+                            first_token_secs.append(time.perf_counter() - started)
+                            first = False
+                served[result.backend.name] += 1
+            except ProviderError:
+                failed += 1
+
+    await asyncio.gather(*(turn() for _ in range(args.turns)))
+    ordered = sorted(first_token_secs)
+    print(
+        f"{name:<10} ttft p50={statistics.median(ordered) * 1000:>6.0f}ms "
+        f"p95={ordered[int(len(ordered) * 0.95)] * 1000:>6.0f}ms "
+        f"p99={ordered[int(len(ordered) * 0.99)] * 1000:>6.0f}ms "
+        f"failed={failed:>3} served={dict(served)} "
+        f"model calls={sum(calls.values())}"
+    )
+
+
+async def main(args) -> None:
+    primary = LatencyProfile.parse(args.primary)
+    secondary = LatencyProfile.parse(args.secondary)
+    print(
+        f"{args.turns} turns, {args.concurrency} concurrent, "
+        f"primary {args.primary}, secondary {args.secondary} (median:p99:errors)"
+    )
+
+    def backends(count: int) -> list:
+        profiles = [("primary", primary), ("secondary", secondary)][:count]
+        return [
+            (ModelBackend("fake", name), fake_agent(profile, args.tokens, seed=i))
+            for i, (name, profile) in enumerate(profiles)
+        ]
+
+    await run_scenario("single", backends(1), Routing(), args)
+    await run_scenario("failover", backends(2), Routing(), args)
+    await run_scenario(
+        "hedged",
+        backends(2),
+        Routing(
+            hedge=True,
+            hedge_min_delay_secs=args.hedge_min_delay_ms / 1000,
+            hedge_default_delay_secs=args.hedge_min_delay_ms / 1000,
+        ),
+        args,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--primary", default="0.4:2.5:0.02")
+    parser.add_argument("--secondary", default="0.6:1.2:0.01")
+    parser.add_argument("--hedge-min-delay-ms", type=float, default=300)
+    asyncio.run(main(parser.parse_args()))
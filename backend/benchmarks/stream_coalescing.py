@@ -0,0 +1,88 @@
+# Frame rate and CPU benchmark for coalescing streamed chat text.
+#
+# Runs many concurrent fake model streams through the NDJSON delta framing of
+# POST /threads/{id}/chat, once writing every token as its own frame and once
+# with the flush policy of app/core/stream_writer.py, and reports frames per
+# second, CPU per stream and the latency added to each token.
+#
+# Tokens arrive in bursts, like a provider stream under load:
+#
+#   python -m benchmarks.stream_coalescing --streams 200 --tokens 500
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from app.core.stream_writer import FlushPolicy, coalesce_text
+from app.schemas.responses import ChatStreamDeltaResponse
+
+
+async def fake_model_stream(tokens: int, burst: int, gap_secs: float, emitted: list):
+    rng = random.Random(tokens)
+    for i in range(tokens):
+        if i % burst == 0:
+            await asyncio.sleep(rng.uniform(0, 2 * gap_secs))
+        emitted.append(time.perf_counter())
+        yield f" tok{i}"
+
+
+async def run_stream(policy: FlushPolicy, args, stats: dict) -> None:
+    emitted: list[float] = []
+    chunks = fake_model_stream(args.tokens, args.burst, args.gap_ms / 1000, emitted)
+    delivered = 0
+    async for text in coalesce_text(chunks, policy):
+        frame = ChatStreamDeltaResponse.model_construct(content=text)
+        stats["bytes"] += len(frame.model_dump_json().encode("utf-8") + b"\n")
+        stats["frames"] += 1
+        # every frame is one socket write and one wakeup of the response task
+        await asyncio.sleep(0)
+        now = time.perf_counter()
+        stats["delays"].extend(now - emitted_at for emitted_at in emitted[delivered:])
+        delivered = len(emitted)
+
+
+async def run_policy(name: str, policy: FlushPolicy, args) -> None:
+    stats = {"frames": 0, "bytes": 0, "delays": []}
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    await asyncio.gather(
+        *(run_stream(policy, args, stats) for _ in range(args.streams))
+    )
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+
+    delays = sorted(stats["delays"])
+    print(
+        f"{name:<12} frames={stats['frames']:>8} "
+        f"frames/s={stats['frames'] / wall:>10.0f} "
+        f"cpu/stream={cpu / args.streams * 1000:>7.2f}ms "
+        f"delay p50={statistics.median(delays) * 1000:>6.2f}ms "
+        f"p99={delays[int(len(delays) * 0.99)] * 1000:>6.2f}ms "
+        f"bytes={stats['bytes']}"
+    )
+
+
+async def main(args) -> None:
+    print(
+        f"{args.streams} streams x {args.tokens} tokens, "
+        f"bursts of {args.burst} every ~{args.gap_ms}ms"
+    )
+    await run_policy("per-token", FlushPolicy(max_bytes=0, max_latency_secs=0), args)
+    await run_policy(
+        "coalesced",
+        FlushPolicy(
+            max_bytes=args.max_bytes, max_latency_secs=args.max_latency_ms / 1000
+        ),
+        args,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--streams", type=int, default=200)
+    parser.add_argument("--tokens", type=int, default=500)
+    parser.add_argument("--burst", type=int, default=8)
+    parser.add_argument("--gap-ms", type=float, default=20)
+    parser.add_argument("--max-bytes", type=int, default=2048)
+    parser.add_argument("--max-latency-ms", type=float, default=30)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,54 @@
+# Tests run against SQLite (aiosqlite) instead of Postgres:
+#
+#   pip install -r requirements-dev.txt && python -m pytest
+
+import asyncio
+import os
+
+for name in (
+    "SECURITY__JWT_SECRET_KEY",
+    "DATABASE__PASSWORD",
+    "APPCONFIG__OPENAI_API_KEY",
+    "APPCONFIG__GROQ_API_KEY",
+    "APPCONFIG__GEMINI_API_KEY",
+):
+    os.environ.setdefault(name, "test")
+
+import pytest
+from sqlalchemy import BigInteger
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+
+from app.core import database_session
+from app.models.base_model import Base
+
+
+# SQLite only autoincrements INTEGER PRIMARY KEY columns
+@compiles(BigInteger, "sqlite")
+def _sqlite_big_integer(type_, compiler, **kw):
+    return "INTEGER"
+
+
+@pytest.fixture
+def run_with_db(tmp_path, monkeypatch):
+    # Runs a coroutine on a fresh SQLite database; get_async_session returns
+    # sessions of it meanwhile.
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.sqlite'}")
+    monkeypatch.setattr(
+        database_session,
+        "_ASYNC_SESSIONMAKER",
+        async_sessionmaker(engine, expire_on_commit=False),
+    )
+
+    def run(coroutine):
+        async def main():
+            try:
+                async with engine.begin() as connection:
+                    await connection.run_sync(Base.metadata.create_all)
+                return await coroutine
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,197 @@
+import ast
+import asyncio
+import re
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage, ModelResponse, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from sqlalchemy import select
+
+from app.chat.titles import ThreadTitleBatchResult, TitleWorker, run_sweeper
+from app.core.database_session import get_async_session
+from app.models.chat_message import ChatMessage
+from app.models.thread import Thread
+from app.models.user import User
+
+PROMPT_LINE = re.compile(r"^\s*(\d+): (.+)$", re.MULTILINE)
+
+
+def prompt_messages(messages: list[ModelMessage]) -> dict[int, str]:
+    # {index: first message} as numbered in build_titles_prompt
+    prompt = messages[-1].parts[-1].content
+    return {
+        int(index): ast.literal_eval(content)
+        for index, content in PROMPT_LINE.findall(prompt)
+    }
+
+
+def titles_model(make_titles):
+    # FunctionModel answering with the result tool; make_titles maps the
+    # numbered first messages to a list of {"index", "title"}
+    def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        titles = make_titles(prompt_messages(messages))
+        return ModelResponse(
+            parts=[ToolCallPart(info.result_tools[0].name, {"titles": titles})]
+        )
+
+    return FunctionModel(respond)
+
+
+def title_worker(model: FunctionModel, **config) -> TitleWorker:
+    worker = TitleWorker(Agent(model, result_type=ThreadTitleBatchResult))
+    worker.config = worker.config.model_copy(update={"retry_backoff_secs": 0, **config})
+    return worker
+
+
+async def create_threads(first_messages: list[str]) -> list[str]:
+    async with get_async_session() as session:
+        user = User(
+            display_name="Test",
+            email="test@example.com",
+            hashed_password="x",
+            is_active=True,
+            is_superuser=False,
+        )
+        session.add(user)
+        await session.flush()
+        thread_ids = []
+        for content in first_messages:
+            thread = Thread(user_id=user.id, config={})
+            session.add(thread)
+            await session.flush()
+            for role, text in (("user", content), ("assistant", "answer")):
+                session.add(
+                    ChatMessage(
+                        thread_id=thread.id,
+                        user_id=user.id,
+                        role=role,
+                        content=text,
+                        content_type="text",
+                    )
+                )
+            thread_ids.append(thread.id)
+        await session.commit()
+    return thread_ids
+
+
+async def stored_titles(thread_ids: list[str]) -> dict[str, str | None]:
+    async with get_async_session() as session:
+        rows = await session.execute(
+            select(Thread.id, Thread.title).where(Thread.id.in_(thread_ids))
+        )
+        return dict(rows.all())
+
+
+def test_process_batch_maps_titles_to_their_threads(run_with_db):
+    # answered in reverse order, every title must land on its own thread
+    model = titles_model(
+        lambda numbered: [
+            {"index": index, "title": f"About {content}"}
+            for index, content in reversed(numbered.items())
+        ]
+    )
+    worker = title_worker(model)
+
+    async def main():
+        thread_ids = await create_threads(["cats", "dogs", "birds"])
+        titles = await worker.process_batch(thread_ids)
+        return thread_ids, titles, await stored_titles(thread_ids)
+
+    thread_ids, titles, stored = run_with_db(main())
+    assert stored == titles
+    assert stored == {
+        thread_ids[0]: "About cats",
+        thread_ids[1]: "About dogs",
+        thread_ids[2]: "About birds",
+    }
+
+
+def test_process_batch_ignores_out_of_range_indexes(run_with_db):
+    model = titles_model(
+        lambda numbered: [
+            {"index": -1, "title": "negative"},
+            {"index": 1, "title": "Second"},
+            {"index": len(numbered), "title": "past the end"},
+        ]
+    )
+    worker = title_worker(model)
+
+    async def main():
+        thread_ids = await create_threads(["first", "second"])
+        titles = await worker.process_batch(thread_ids)
+        return thread_ids, titles, await stored_titles(thread_ids)
+
+    thread_ids, titles, stored = run_with_db(main())
+    assert titles == {thread_ids[1]: "Second"}
+    assert stored == {thread_ids[0]: None, thread_ids[1]: "Second"}
+
+
+def test_process_batch_retries_failed_generations(run_with_db):
+    calls = 0
+
+    def make_titles(numbered):
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise RuntimeError("provider unavailable")
+        return [{"index": 0, "title": "Finally"}]
+
+    worker = title_worker(titles_model(make_titles), max_retries=3)
+
+    async def main():
+        thread_ids = await create_threads(["hello"])
+        return thread_ids, await worker.process_batch(thread_ids)
+
+    thread_ids, titles = run_with_db(main())
+    assert calls == 3
+    assert titles == {thread_ids[0]: "Finally"}
+
+
+def test_process_batch_gives_up_after_max_retries(run_with_db):
+    calls = 0
+
+    def make_titles(numbered):
+        nonlocal calls
+        calls += 1
+        raise RuntimeError("provider unavailable")
+
+    worker = title_worker(titles_model(make_titles), max_retries=2)
+
+    async def main():
+        thread_ids = await create_threads(["hello"])
+        with pytest.raises(RuntimeError):
+            await worker.process_batch(thread_ids)
+        return await stored_titles(thread_ids)
+
+    stored = run_with_db(main())
+    assert calls == 3
+    assert list(stored.values()) == [None]
+
+
+def test_sweeper_titles_threads_older_than_min_age(run_with_db):
+    model = titles_model(
+        lambda numbered: [
+            {"index": index, "title": f"About {content}"}
+            for index, content in numbered.items()
+        ]
+    )
+    worker = title_worker(model)
+
+    async def sweep(thread_ids, min_age_secs):
+        sweeper = asyncio.create_task(
+            run_sweeper(worker, poll_interval_secs=0.01, min_age_secs=min_age_secs)
+        )
+        await asyncio.sleep(0.2)
+        sweeper.cancel()
+        return await stored_titles(thread_ids)
+
+    async def main():
+        thread_ids = await create_threads(["dropped"])
+        # a fresh thread may still be in the queue
+        too_young = await sweep(thread_ids, 3600)
+        return too_young, await sweep(thread_ids, 0)
+
+    too_young, swept = run_with_db(main())
+    assert list(too_young.values()) == [None]
+    assert list(swept.values()) == ["About dropped"]
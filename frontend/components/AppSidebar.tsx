@@ -16,7 +16,7 @@ import { Avatar } from './ui/avatar'
 import { useMemo } from 'react'
 import { AvatarFallback } from '@radix-ui/react-avatar'
 import { Separator } from './ui/separator'
-import { useGetData } from '@/hooks/useData'
+import { useGetPages } from '@/hooks/useData'
 import Link from 'next/link'
 import { Button } from './ui/button'
 import { useParams } from 'next/navigation'
@@ -88,7 +88,7 @@ export default function AppSidebar() {
 }
 
 function ThreadList({ params }: { params: Params }) {
-  const { data } = useGetData<Dict[]>('/threads')
+  const { data, hasMore, isLoadingMore, loadMore } = useGetPages<Dict>('/threads')
   const groupedData = useMemo(() => {
     if (data && Array.isArray(data)) {
       const groups: Dict = {
@@ -117,28 +117,39 @@ function ThreadList({ params }: { params: Params }) {
     const empty: Dict = {}
     return empty
   }, [data])
-  return Object.keys(groupedData).map((group) => (
-    <SidebarGroup key={group}>
-      <SidebarGroupLabel className='text-foreground'>{THREAD_GROUP_LABELS[group]}</SidebarGroupLabel>
-      <SidebarGroupContent>
-        <SidebarMenu>
-          {Array.from<Dict>(groupedData[group]).map((thread) => (
-            <SidebarMenuItem
-              key={thread['id']}
-              className={cx(
-                'px-2 py-1 rounded-md hover:bg-primary/5 mr-2',
-                thread['id'] == params['chat'] && 'bg-primary/10'
-              )}
-            >
-              <Link className='text-md block text-ellipsis' href={`/app/chat/${thread['id']}`}>
-                {thread['title'] ?? 'Unknown title'}
-              </Link>
-            </SidebarMenuItem>
-          ))}
-        </SidebarMenu>
-      </SidebarGroupContent>
-    </SidebarGroup>
-  ))
+  return (
+    <>
+      {Object.keys(groupedData).map((group) => (
+        <SidebarGroup key={group}>
+          <SidebarGroupLabel className='text-foreground'>{THREAD_GROUP_LABELS[group]}</SidebarGroupLabel>
+          <SidebarGroupContent>
+            <SidebarMenu>
+              {Array.from<Dict>(groupedData[group]).map((thread) => (
+                <SidebarMenuItem
+                  key={thread['id']}
+                  className={cx(
+                    'px-2 py-1 rounded-md hover:bg-primary/5 mr-2',
+                    thread['id'] == params['chat'] && 'bg-primary/10'
+                  )}
+                >
+                  <Link className='text-md block text-ellipsis' href={`/app/chat/${thread['id']}`}>
+                    {thread['title'] ?? 'Unknown title'}
+                  </Link>
+                </SidebarMenuItem>
+              ))}
+            </SidebarMenu>
+          </SidebarGroupContent>
+        </SidebarGroup>
+      ))}
+      {hasMore && (
+        <div className='px-2 py-1'>
+          <Button variant='link' onClick={loadMore} disabled={isLoadingMore} className='px-0 text-slate-500'>
+            {isLoadingMore ? 'Loading...' : 'Show older chats'}
+          </Button>
+        </div>
+      )}
+    </>
+  )
 }
 
 const THREAD_GROUP_LABELS: Dict = {
@@ -22,9 +22,16 @@ async function postMessageToThread(
   threadId: string,
   message: string,
   handleToken: (token: string) => void,
-  isNewChat: boolean = false
+  isNewChat: boolean = false,
+  idempotencyKey: string = crypto.randomUUID()
 ) {
-  const payload = { prompt: message, content_type: 'text', is_new_chat: isNewChat }
+  // one key per submit: a retry of the same submit attaches to its answer
+  const payload = {
+    prompt: message,
+    content_type: 'text',
+    is_new_chat: isNewChat,
+    idempotency_key: idempotencyKey,
+  }
   const response = await fetch(`/api/threads/${threadId}/chat`, {
     method: 'POST',
     body: JSON.stringify(payload),
@@ -1,7 +1,9 @@
 /* eslint-disable @typescript-eslint/no-explicit-any */
 // hooks/useData.ts
+import { useMemo } from 'react'
 import useSWR, { SWRConfiguration } from 'swr'
-import api from '../lib/api'
+import useSWRInfinite from 'swr/infinite'
+import api, { Page } from '../lib/api'
 
 // Generic fetcher function for SWR
 const fetcher = (url: string) => api.get(url)
@@ -10,6 +12,27 @@ export const useGetData = <T>(endpoint: string, options: SWRConfiguration = {})
   return useSWR<T>(endpoint, fetcher, options)
 }
 
+// Keyset-paginated listings: pages are fetched one by one following the
+// X-Next-Cursor header, loadMore fetches the next one
+export const useGetPages = <T>(endpoint: string, options: SWRConfiguration = {}) => {
+  const getKey = (pageIndex: number, previousPage: Page<T> | null) => {
+    if (pageIndex === 0) return endpoint
+    if (!previousPage?.nextCursor) return null
+    const separator = endpoint.includes('?') ? '&' : '?'
+    return `${endpoint}${separator}cursor=${encodeURIComponent(previousPage.nextCursor)}`
+  }
+  const { data: pages, size, setSize, ...rest } = useSWRInfinite<Page<T>>(
+    getKey,
+    (url: string) => api.getPage<T>(url),
+    options
+  )
+  const data = useMemo(() => pages?.flatMap((page) => page.data), [pages])
+  const hasMore = Boolean(pages && pages[pages.length - 1]?.nextCursor)
+  const isLoadingMore = size > 0 && pages !== undefined && pages.length < size
+  const loadMore = () => setSize(size + 1)
+  return { data, hasMore, isLoadingMore, loadMore, ...rest }
+}
+
 export const usePostData = <T>(endpoint: string, options: SWRConfiguration = {}) => {
   const { mutate } = useSWR<T>(endpoint, options)
 
@@ -31,32 +31,52 @@ const fetchWithAuth = async (url: string, options: RequestInit = {}) => {
     throw new Error('Unauthorized')
   }
 
-  // Parse JSON response
   if (!response.ok) {
     throw new Error(`API error: ${response.status}`)
   }
 
+  return response
+}
+
+const fetchJsonWithAuth = async (url: string, options: RequestInit = {}) => {
+  const response = await fetchWithAuth(url, options)
   return response.json()
 }
 
+// Paginated listings return the cursor of the next page in this header
+const NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+export interface Page<T> {
+  data: T[]
+  nextCursor: string | null
+}
+
 // API service functions
 const api = {
-  get: (endpoint: string) => fetchWithAuth(`/api${endpoint}`),
+  get: (endpoint: string) => fetchJsonWithAuth(`/api${endpoint}`),
+
+  getPage: async <T>(endpoint: string): Promise<Page<T>> => {
+    const response = await fetchWithAuth(`/api${endpoint}`)
+    return {
+      data: await response.json(),
+      nextCursor: response.headers.get(NEXT_CURSOR_HEADER),
+    }
+  },
 
   post: (endpoint: string, data: any) =>
-    fetchWithAuth(`/api${endpoint}`, {
+    fetchJsonWithAuth(`/api${endpoint}`, {
       method: 'POST',
       body: JSON.stringify(data),
     }),
 
   put: (endpoint: string, data: any) =>
-    fetchWithAuth(`/api${endpoint}`, {
+    fetchJsonWithAuth(`/api${endpoint}`, {
       method: 'PUT',
       body: JSON.stringify(data),
     }),
 
   delete: (endpoint: string) =>
-    fetchWithAuth(`/api${endpoint}`, {
+    fetchJsonWithAuth(`/api${endpoint}`, {
       method: 'DELETE',
     }),
 }